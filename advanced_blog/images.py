@@ -0,0 +1,206 @@
+"""Resized renditions of uploaded images.
+
+Uploading a post's featured image or a profile picture used to mean every
+page served the full-resolution original.  ``ResponsiveImageField`` now
+queues a background job on upload that writes scaled WebP and JPEG copies
+next to the original::
+
+    posts/2025/11/09/photo.png
+    posts/2025/11/09/renditions/photo.png.thumb.webp   (and .jpg)
+    posts/2025/11/09/renditions/photo.png.card.webp
+    posts/2025/11/09/renditions/photo.png.hero.webp
+    posts/2025/11/09/renditions/photo.png.json          manifest, written last
+
+Templates render them with ``{% responsive_image %}`` (apps.blog.templatetags
+.blog_tags), which falls back to the original until the manifest exists.
+Images are never upscaled, so small originals get fewer renditions.
+
+Settings (``IMAGE_RENDITIONS`` in settings.py):
+    QUALITY   WebP/JPEG encoder quality
+    WORKERS   background threads resizing uploads
+    ASYNC     False resizes inside the request (useful in tests and scripts)
+"""
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, models, transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Target widths, smallest first
+SIZES = {'thumb': 160, 'card': 640, 'hero': 1280}
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+SAVE_OPTIONS = {'webp': {'method': 4}, 'jpeg': {'optimize': True, 'progressive': True}}
+DEFAULTS = {
+    'QUALITY': 82,
+    'WORKERS': 2,
+    'ASYNC': True,
+}
+MANIFEST_CACHE_KEY = 'images:manifest:%s'
+
+# Sent from the worker once an image's renditions are stored, with the model
+# that uploaded it as sender and ``name`` (the original) and ``pk`` kwargs.
+renditions_ready = Signal()
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'IMAGE_RENDITIONS', {}))
+    return config
+
+
+# The full original filename is kept so photo.jpg and photo.png don't clash
+def rendition_name(name, size, fmt):
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, 'renditions', f'{filename}.{size}.{EXTENSIONS[fmt]}')
+
+
+def manifest_name(name):
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, 'renditions', f'{filename}.json')
+
+
+def _manifest_cache_key(name):
+    return MANIFEST_CACHE_KEY % hashlib.md5(name.encode()).hexdigest()
+
+
+def _encode(image, fmt, quality):
+    if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+        # JPEG has no alpha channel; flatten transparency onto white
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, FORMATS[fmt], quality=quality, **SAVE_OPTIONS[fmt])
+    return buffer.getvalue()
+
+
+def _replace(storage, name, content):
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(content))
+
+
+def generate_renditions(name, storage=None):
+    """Write every rendition of ``name`` and its manifest; returns the manifest."""
+    storage = storage or default_storage
+    quality = get_config()['QUALITY']
+    largest = max(SIZES.values())
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        # Let the JPEG decoder downscale while decoding; much cheaper for
+        # large camera photos
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    manifest = {}
+    done_widths = set()
+    for size, target in SIZES.items():
+        width = min(target, image.width)
+        if width in done_widths:
+            continue
+        done_widths.add(width)
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        entry = {'width': width}
+        for fmt in FORMATS:
+            entry[fmt] = _replace(storage, rendition_name(name, size, fmt), _encode(resized, fmt, quality))
+        manifest[size] = entry
+
+    _replace(storage, manifest_name(name), json.dumps(manifest).encode())
+    cache.set(_manifest_cache_key(name), manifest, None)
+    return manifest
+
+
+def get_manifest(name, storage=None):
+    """The renditions of ``name``, or ``{}`` if they haven't been generated yet."""
+    key = _manifest_cache_key(name)
+    manifest = cache.get(key)
+    if manifest is not None:
+        return manifest
+    storage = storage or default_storage
+    try:
+        with storage.open(manifest_name(name), 'rb') as fh:
+            manifest = json.loads(fh.read())
+    except (OSError, ValueError):
+        # Not processed yet; check again shortly rather than on every render
+        cache.set(key, {}, 60)
+        return {}
+    cache.set(key, manifest, None)
+    return manifest
+
+
+def forget_manifest(name):
+    cache.delete(_manifest_cache_key(name))
+
+
+class RenditionWorker:
+    """A small per-process thread pool that resizes uploads off the request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        # Created lazily so forked server workers each get their own threads
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=get_config()['WORKERS'], thread_name_prefix='renditions',
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, name, model, pk):
+        try:
+            generate_renditions(name)
+            renditions_ready.send(sender=model, name=name, pk=pk)
+        except Exception:
+            logger.exception('Failed to generate renditions for %s', name)
+
+    def _run_in_thread(self, name, model, pk):
+        try:
+            self._run(name, model, pk)
+        finally:
+            # Receivers may query the database from this thread
+            close_old_connections()
+
+    def submit(self, name, model, pk):
+        if get_config()['ASYNC']:
+            self._get_executor().submit(self._run_in_thread, name, model, pk)
+        else:
+            self._run(name, model, pk)
+
+
+rendition_worker = RenditionWorker()
+
+
+class ResponsiveImageField(models.ImageField):
+    """ImageField that generates renditions whenever a new file is uploaded."""
+
+    def pre_save(self, model_instance, add):
+        file = getattr(model_instance, self.attname)
+        uploaded = bool(file) and not file._committed
+        file = super().pre_save(model_instance, add)
+        if uploaded:
+            name, model = file.name, type(model_instance)
+            # Resize once the row is committed so the worker sees the new image
+            transaction.on_commit(lambda: rendition_worker.submit(name, model, model_instance.pk))
+        return file
@@ -0,0 +1,218 @@
+"""Per-request timing and query instrumentation.
+
+``RequestMetricsMiddleware`` (advanced_blog/middleware.py) measures every
+request without needing DEBUG:
+
+    total   wall time through the middleware stack and view
+    db      query count and time, via ``connection.execute_wrapper``
+    tpl     template rendering of ``TemplateResponse`` views (function
+            views that call ``render()`` count it as view time)
+    bytes   response size (unknown for streaming responses)
+
+and reports it three ways: a ``Server-Timing`` header (visible in the
+browser's network panel), a warning on the ``advanced_blog.metrics`` logger
+for requests over the thresholds, listing the statements that ran most
+often (the usual sign of an N+1 loop), and per-route histograms served as
+JSON to admins at ``/admin/metrics/``.
+
+Histograms live in process memory, so under gunicorn each worker reports
+its own traffic since it started; the response includes the worker's pid.
+
+Settings (``REQUEST_METRICS`` in settings.py):
+    ENABLED             False skips all measuring
+    SERVER_TIMING       add the Server-Timing header (off unless set: it
+                        exposes query counts and timings to every visitor)
+    SLOW_REQUEST_MS     log requests slower than this
+    SLOW_QUERY_COUNT    log requests running more queries than this
+    DUPLICATE_QUERIES   statements repeated at least this often are listed
+                        in the slow log
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': False,
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_QUERY_COUNT': 50,
+    'DUPLICATE_QUERIES': 5,
+}
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'REQUEST_METRICS', {}))
+    return config
+
+
+class QueryRecorder:
+    """``execute_wrapper`` hook counting and timing the statements it sees."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            # Parameters are bound separately, so identical SQL means the
+            # same statement shape run again
+            self.statements[sql] += 1
+
+    def record(self):
+        """Context manager installing the hook on every database connection."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    def duplicates(self, threshold, limit=3):
+        return [
+            (count, sql) for sql, count in self.statements.most_common(limit) if count >= threshold
+        ]
+
+
+class RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.db_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.bytes = 0
+        self.statuses = Counter()
+
+    def add(self, sample):
+        self.requests += 1
+        self.buckets[next((i for i, bound in enumerate(BUCKETS) if sample['total_ms'] <= bound), len(BUCKETS))] += 1
+        self.total_ms += sample['total_ms']
+        self.max_ms = max(self.max_ms, sample['total_ms'])
+        self.db_ms += sample['db_ms']
+        self.queries += sample['queries']
+        self.max_queries = max(self.max_queries, sample['queries'])
+        self.bytes += sample['bytes'] or 0
+        self.statuses[f'{sample["status"] // 100}xx'] += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of requests."""
+        target = fraction * self.requests
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+    def stats(self):
+        n = self.requests
+        return {
+            'requests': n,
+            'avg_ms': round(self.total_ms / n, 3),
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'avg_db_ms': round(self.db_ms / n, 3),
+            'avg_queries': round(self.queries / n, 2),
+            'max_queries': self.max_queries,
+            'avg_bytes': round(self.bytes / n),
+            'statuses': dict(self.statuses),
+            'histogram': {
+                **{f'le_{bound}': count for bound, count in zip(BUCKETS, self.buckets)},
+                'gt_%d' % BUCKETS[-1]: self.buckets[-1],
+            },
+        }
+
+
+class RequestMetrics:
+    """Thread-safe per-route aggregates for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.routes = {}
+        self.slow_requests = 0
+
+    def add(self, route, sample, slow=False):
+        with self._lock:
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = RouteStats()
+            stats.add(sample)
+            self.slow_requests += slow
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'slow_requests': self.slow_requests,
+                'routes': {route: stats.stats() for route, stats in sorted(self.routes.items())},
+            }
+
+
+request_metrics = RequestMetrics()
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else '<unresolved>'
+    return f'{request.method} {view}'
+
+
+def server_timing(sample):
+    return ', '.join([
+        f'db;dur={sample["db_ms"]:.1f};desc="{sample["queries"]} queries"',
+        f'tpl;dur={sample["template_ms"]:.1f}',
+        f'total;dur={sample["total_ms"]:.1f}',
+    ])
+
+
+def log_slow_request(request, sample, recorder, config):
+    duplicates = recorder.duplicates(config['DUPLICATE_QUERIES'])
+    lines = [f'  {count}x {sql[:300]}' for count, sql in duplicates]
+    logger.warning(
+        'Slow request %s %s: %.1fms, %d queries (%.1fms db), %.1fms templates, status %d%s',
+        request.method, request.get_full_path(), sample['total_ms'], sample['queries'],
+        sample['db_ms'], sample['template_ms'], sample['status'],
+        ''.join('\n' + line for line in ['Repeated queries:', *lines]) if lines else '',
+    )
+
+
+@staff_member_required
+def metrics_view(request):
+    """Per-route latency and query aggregates plus the other in-process counters."""
+    if not request.user.is_superuser:
+        raise PermissionDenied
+    from apps.accounts.activity import activity_sink
+    from apps.blog.cache import page_cache_stats
+    from apps.blog.slugs import slug_cache
+
+    return JsonResponse({
+        **request_metrics.stats(),
+        'page_cache': page_cache_stats.stats(),
+        'slug_cache': slug_cache.stats(),
+        'activity_sink': activity_sink.stats(),
+    }, json_dumps_params={'indent': 2})
@@ -1,14 +1,119 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.utils.deprecation import MiddlewareMixin
-from apps.accounts.models import UserActivity
+from whitenoise.middleware import WhiteNoiseMiddleware
+from apps.accounts.activity import activity_sink
+from advanced_blog.metrics import QueryRecorder, get_config, log_slow_request, request_metrics, route_name, server_timing
 
 class UserActivityMiddleware(MiddlewareMixin):
     def process_request(self, request):
         if request.user.is_authenticated and not request.path.startswith('/admin/'):
-            UserActivity.objects.create(
-                user=request.user,
-                activity_type='page_visit',
-                details={
+            # Buffered: rows are written in batches by the activity sink
+            activity_sink.record(
+                request.user,
+                'page_visit',
+                {
                     'path': request.path,
                     'method': request.method
                 }
-            )
\ No newline at end of file
+            )
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that also runs async.
+
+    WhiteNoise is sync only, so under ASGI Django would run it, and with it
+    every view below, in a thread.  Static files are looked up in memory,
+    so async requests can check for one and otherwise carry straight on.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    """Time each request and its queries; see advanced_blog/metrics.py."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        config = get_config()
+        if not config['ENABLED']:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        request._template_ms = 0.0
+        started = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        return self.record(request, response, started, recorder, config)
+
+    async def __acall__(self, request):
+        config = get_config()
+        if not config['ENABLED']:
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        request._template_ms = 0.0
+        started = time.perf_counter()
+        # Database connections belong to threads, and the async ORM runs each
+        # request's queries in one thread of their own: hook that thread's
+        stack = await sync_to_async(recorder.record)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.record(request, response, started, recorder, config)
+
+    def record(self, request, response, started, recorder, config):
+        total_ms = (time.perf_counter() - started) * 1000
+
+        sample = {
+            'total_ms': total_ms,
+            'db_ms': recorder.duration * 1000,
+            'queries': recorder.count,
+            'template_ms': request._template_ms,
+            'bytes': None if response.streaming else len(response.content),
+            'status': response.status_code,
+        }
+        slow = total_ms > config['SLOW_REQUEST_MS'] or recorder.count > config['SLOW_QUERY_COUNT']
+        if slow:
+            log_slow_request(request, sample, recorder, config)
+        request_metrics.add(route_name(request), sample, slow)
+        if config['SERVER_TIMING']:
+            response['Server-Timing'] = server_timing(sample)
+        return response
+
+    def process_template_response(self, request, response):
+        # Runs just before the response is rendered; the callback right after
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._template_ms += (time.perf_counter() - started) * 1000
+
+        response.add_post_render_callback(rendered)
+        return response
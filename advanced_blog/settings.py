@@ -14,6 +14,8 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 import dj_database_url
+from django.templatetags.static import static
+from django.utils.functional import lazy
 
 # Load environment variables from .env when present (local dev)
 load_dotenv()
@@ -47,6 +49,8 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    # Serve static files through WhiteNoise under runserver too
+    'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
     'ckeditor',
     'ckeditor_uploader',
@@ -59,6 +63,10 @@ AUTH_USER_MODEL = 'accounts.User'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # WhiteNoise, without forcing async requests through a thread
+    'advanced_blog.middleware.StaticFilesMiddleware',
+    # After WhiteNoise so static files aren't measured
+    'advanced_blog.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -103,10 +111,87 @@ DATABASES = {
 database_url = os.environ.get('DATABASE_URL')
 if database_url:
     DATABASES = {
-        'default': dj_database_url.parse(database_url, conn_max_age=600)
+        # The ASGI profile (gunicorn.conf.py) turns persistent connections
+        # off: each request's database work runs in its own thread there
+        'default': dj_database_url.parse(database_url, conn_max_age=int(os.environ.get('DJANGO_CONN_MAX_AGE', '600')))
     }
 
 
+# Cache
+# DJANGO_CACHE_BACKEND: 'locmem' (default, per process), 'file', or 'redis'
+# (any Redis-compatible server; requires the `redis` package).
+# The page cache invalidates by bumping version keys stored in this cache
+# (apps/blog/cache.py).  With locmem every worker process has its own
+# versions, so an edit only invalidates the worker that handled it and the
+# others keep serving (and answering 304 for) the old page until it
+# expires.  Use 'file' or 'redis' with more than one worker; the blog.E002
+# check and gunicorn.conf.py refuse locmem otherwise.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+cache_backend = os.environ.get('DJANGO_CACHE_BACKEND', 'locmem')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[cache_backend],
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', {
+            'locmem': 'advanced-blog',
+            'file': str(BASE_DIR / '.cache'),
+            'redis': 'redis://127.0.0.1:6379/1',
+        }[cache_backend]),
+    }
+}
+
+# Sessions (DJANGO_SESSION_ENGINE):
+#   cached_db            read through the cache, written through to the
+#                        database, so a signed-in request skips the session
+#                        SELECT whenever the cache has it.  The default with
+#                        a shared cache ('file' or 'redis'); with locmem a
+#                        logout in one worker would leave the session valid
+#                        in the other workers' caches
+#   signed_cookies       no server-side storage at all; the session lives
+#                        in a signed cookie and cannot be revoked server-side
+#   db                   Django's default, one SELECT per request; the
+#                        default with the locmem cache
+# Expired database rows are removed with ``manage.py prune_sessions``.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('DJANGO_SESSION_ENGINE', 'db' if cache_backend == 'locmem' else 'cached_db')]
+
+# Flash messages travel in the ``messages`` cookie rather than the session,
+# so showing one never writes a session row; the page cache also keys off
+# that cookie (apps/blog/cache.py).
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Seconds a rendered public page stays cached; pages are also invalidated
+# whenever their content changes (apps/blog/cache.py).
+BLOG_PAGE_CACHE_TIMEOUT = int(os.environ.get('BLOG_PAGE_CACHE_TIMEOUT', '300'))
+
+# Seconds resolved category/tag slugs stay in each process's memory; 0
+# disables it (apps/blog/slugs.py).
+BLOG_SLUG_CACHE_TTL = int(os.environ.get('BLOG_SLUG_CACHE_TTL', '60'))
+
+# Cursor-based pagination for post listings: constant cost at any depth,
+# but no page numbers or totals (apps/blog/pagination.py).
+BLOG_KEYSET_PAGINATION = os.environ.get('BLOG_KEYSET_PAGINATION', 'False').lower() in ('1', 'true', 'yes')
+
+# Serve the public read views async (apps/blog/async_views.py); set by the
+# ASGI profile in gunicorn.conf.py.
+BLOG_ASYNC_VIEWS = os.environ.get('BLOG_ASYNC_VIEWS', 'False').lower() in ('1', 'true', 'yes')
+
+# Where ``manage.py export_static`` writes the pre-rendered public pages
+# (apps/blog/management/commands/export_static.py).
+STATIC_EXPORT_ROOT = Path(os.environ.get('STATIC_EXPORT_ROOT', BASE_DIR / 'static_export'))
+
+# Seconds the admin dashboard's site-wide totals are cached
+# (apps/accounts/dashboard.py).
+DASHBOARD_TOTALS_TIMEOUT = int(os.environ.get('DASHBOARD_TOTALS_TIMEOUT', '60'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -145,6 +230,25 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
+# Hashed, pre-compressed (gzip, and brotli when the Brotli package is
+# installed) static files served by WhiteNoise.  Requires collectstatic, so
+# it is on by default only when DEBUG is off.
+STATIC_MANIFEST = os.environ.get('DJANGO_STATIC_MANIFEST', str(not DEBUG)).lower() in ('1', 'true', 'yes')
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'whitenoise.storage.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
+# Hashed names get a ten-year immutable Cache-Control from WhiteNoise.  This
+# applies to unhashed names, such as the CKEditor plugins its JS loads by path.
+WHITENOISE_MAX_AGE = 0 if DEBUG else 3600
+
 # Media files (User uploaded files)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -161,9 +265,10 @@ CKEDITOR_CONFIGS = {
         'toolbar': 'full',
         'height': 300,
         'width': '100%',
-        # Load a small contents CSS so the editor iframe matches site styling
-        # (use absolute/static path so CKEditor can fetch it)
-        'contentsCss': ['/static/css/editor_contents.css'],
+        # Load a small contents CSS so the editor iframe matches site styling.
+        # Resolved lazily through the staticfiles storage so the hashed name
+        # is used; checked by apps.blog.checks.
+        'contentsCss': [lazy(static, str)('css/editor_contents.css')],
         # Apply editor body class so we can target editor content if needed
         'bodyClass': 'ck-content',
     },
@@ -173,3 +278,35 @@ CKEDITOR_CONFIGS = {
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'blog:home'
 LOGOUT_REDIRECT_URL = 'blog:home'
+
+# Buffered page-visit logging (see apps/accounts/activity.py)
+ACTIVITY_LOG = {
+    'BATCH_SIZE': int(os.environ.get('ACTIVITY_LOG_BATCH_SIZE', '100')),
+    'FLUSH_INTERVAL': float(os.environ.get('ACTIVITY_LOG_FLUSH_INTERVAL', '2.0')),
+    'MAX_QUEUE': int(os.environ.get('ACTIVITY_LOG_MAX_QUEUE', '10000')),
+    # 'drop' discards new events when the queue is full, 'block' waits briefly
+    'OVERFLOW': os.environ.get('ACTIVITY_LOG_OVERFLOW', 'drop'),
+    'BLOCK_TIMEOUT': 0.05,
+    # Raw rows older than this are pruned; daily rollups are kept
+    'RETENTION_DAYS': int(os.environ.get('ACTIVITY_RETENTION_DAYS', '90')),
+}
+
+# Per-request timing, Server-Timing headers and the slow-request log
+# (see advanced_blog/metrics.py)
+REQUEST_METRICS = {
+    'ENABLED': os.environ.get('REQUEST_METRICS', 'True').lower() in ('1', 'true', 'yes'),
+    # The header shows anyone query counts and timings, so it is only on by
+    # default in development
+    'SERVER_TIMING': os.environ.get('REQUEST_METRICS_SERVER_TIMING', str(DEBUG)).lower() in ('1', 'true', 'yes'),
+    'SLOW_REQUEST_MS': float(os.environ.get('SLOW_REQUEST_MS', '500')),
+    'SLOW_QUERY_COUNT': int(os.environ.get('SLOW_QUERY_COUNT', '50')),
+    'DUPLICATE_QUERIES': 5,
+}
+
+# Resized copies of uploaded images (see advanced_blog/images.py)
+IMAGE_RENDITIONS = {
+    'QUALITY': int(os.environ.get('IMAGE_RENDITION_QUALITY', '82')),
+    'WORKERS': int(os.environ.get('IMAGE_RENDITION_WORKERS', '2')),
+    # False resizes during the upload request instead of in a worker thread
+    'ASYNC': os.environ.get('IMAGE_RENDITION_ASYNC', 'True').lower() in ('1', 'true', 'yes'),
+}
@@ -19,7 +19,11 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
+
 urlpatterns = [
+    # Ahead of the admin so its catch-all patterns don't claim the URL
+    path('admin/metrics/', metrics_view, name='request_metrics'),
     path('admin/', admin.site.urls),
     path('', include(('apps.blog.urls', 'blog'), namespace='blog')),
     path('accounts/', include(('apps.accounts.urls', 'accounts'), namespace='accounts')),
@@ -27,5 +31,5 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
+    # Static files are served by WhiteNoise in every environment
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -0,0 +1,187 @@
+"""Buffered sink for high-volume UserActivity events.
+
+Page visits used to be written with one INSERT per request.  Events are now
+queued in memory and written by a background thread with ``bulk_create``,
+either when a batch fills up or when the flush interval elapses.
+
+Settings (``ACTIVITY_LOG`` in settings.py):
+    BATCH_SIZE      rows per bulk_create
+    FLUSH_INTERVAL  max seconds an event waits in the queue
+    MAX_QUEUE       queue capacity
+    OVERFLOW        'drop' (discard new events when full) or 'block'
+    BLOCK_TIMEOUT   seconds to wait for space when OVERFLOW is 'block'
+    RETENTION_DAYS  days of raw rows kept by ``prune_activity`` (see
+                    apps/accounts/retention.py)
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 2.0,
+    'MAX_QUEUE': 10000,
+    'OVERFLOW': 'drop',
+    'BLOCK_TIMEOUT': 0.05,
+    'RETENTION_DAYS': 90,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'ACTIVITY_LOG', {}))
+    return config
+
+
+class ActivitySink:
+    """Bounded queue plus a daemon thread that flushes it in batches."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._wake = threading.Event()
+        self._stopping = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def incr(self, name, amount=1):
+        # Request threads and the flusher update the counters concurrently
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def stats(self):
+        return {
+            'queued': self.queued,
+            'flushed': self.flushed,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'pending': self._queue.qsize() if self._queue is not None else 0,
+            'flushes': self.flushes,
+            'last_flush_ms': round(self.last_flush_ms, 3),
+            'max_flush_ms': round(self.max_flush_ms, 3),
+            'avg_flush_ms': round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+        }
+
+    def record(self, user, activity_type, details=None):
+        """Queue an activity row once the caller's transaction commits."""
+        event = (user.pk, activity_type, details or {})
+        transaction.on_commit(lambda: self._enqueue(event))
+
+    def _ensure_started(self):
+        # Gunicorn forks workers after the app is imported, so the thread and
+        # queue are created lazily per process rather than at import time.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=get_config()['MAX_QUEUE'])
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='activity-sink', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _enqueue(self, event):
+        self._ensure_started()
+        config = get_config()
+        try:
+            if config['OVERFLOW'] == 'block':
+                self._queue.put(event, timeout=config['BLOCK_TIMEOUT'])
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            self.incr('dropped')
+            return
+        self.incr('queued')
+        if self._queue.qsize() >= config['BATCH_SIZE']:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(get_config()['FLUSH_INTERVAL'])
+            self._wake.clear()
+            try:
+                self.flush()
+            finally:
+                # The flusher owns its own connection; don't let it go stale
+                # between batches.
+                close_old_connections()
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Write everything currently queued.  Safe to call from any thread."""
+        from .models import UserActivity
+
+        if self._queue is None:
+            return 0
+        written = 0
+        batch_size = get_config()['BATCH_SIZE']
+        with self._flush_lock:
+            while True:
+                batch = self._drain(batch_size)
+                if not batch:
+                    break
+                started = time.perf_counter()
+                try:
+                    UserActivity.objects.bulk_create([
+                        UserActivity(user_id=user_id, activity_type=activity_type, details=details)
+                        for user_id, activity_type, details in batch
+                    ])
+                except Exception:
+                    self.incr('failed', len(batch))
+                    logger.exception('Failed to write %d activity rows', len(batch))
+                    continue
+                elapsed = (time.perf_counter() - started) * 1000
+                written += len(batch)
+                with self._lock:
+                    self.flushed += len(batch)
+                    self.flushes += 1
+                    self.last_flush_ms = elapsed
+                    self.total_flush_ms += elapsed
+                    self.max_flush_ms = max(self.max_flush_ms, elapsed)
+        return written
+
+    def shutdown(self):
+        """Stop the flusher and write any pending events (worker exit)."""
+        if self._pid != os.getpid():
+            return
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+
+activity_sink = ActivitySink()
+atexit.register(activity_sink.shutdown)
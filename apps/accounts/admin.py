@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, UserActivity
+from .models import DailyActivity, User, UserActivity
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -27,3 +27,16 @@ class UserActivityAdmin(admin.ModelAdmin):
     list_filter = ('activity_type', 'timestamp')
     search_fields = ('user__username', 'activity_type')
     ordering = ('-timestamp',)
+    list_select_related = ('user',)
+    # Raw rows are the largest table; skip the unfiltered COUNT(*) and use
+    # Daily activities for summaries
+    show_full_result_count = False
+
+@admin.register(DailyActivity)
+class DailyActivityAdmin(admin.ModelAdmin):
+    list_display = ('day', 'user', 'activity_type', 'path', 'count')
+    list_filter = ('activity_type',)
+    date_hierarchy = 'day'
+    search_fields = ('user__username', 'path')
+    list_select_related = ('user',)
+    ordering = ('-day', '-count')
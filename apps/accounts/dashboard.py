@@ -0,0 +1,62 @@
+"""Counts and post tables for the account dashboard.
+
+A user's own numbers come from one conditional-aggregation query over their
+posts.  Site-wide totals (admins only) touch every table, so they are
+cached for ``DASHBOARD_TOTALS_TIMEOUT`` seconds (default 60) and may lag
+that far behind.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
+
+from apps.blog.models import Comment, Post
+from .models import User
+from .retention import summarize_activity
+
+SITE_TOTALS_KEY = 'accounts:dashboard:site-totals'
+PAGE_SIZE = 20
+# Columns shown in the post tables
+TABLE_FIELDS = ('title', 'slug', 'status', 'created_at')
+
+
+def get_timeout():
+    return getattr(settings, 'DASHBOARD_TOTALS_TIMEOUT', 60)
+
+
+def author_stats(user):
+    """Post and pending-comment counts for ``user``'s posts, in one query."""
+    return Post.objects.filter(author=user).aggregate(
+        # The comments join repeats each post, hence distinct
+        posts=Count('pk', distinct=True),
+        drafts=Count('pk', distinct=True, filter=Q(status='draft')),
+        published=Count('pk', distinct=True, filter=Q(status='published')),
+        pending_comments=Count('comments', filter=Q(comments__is_approved=False)),
+    )
+
+
+def site_totals():
+    totals = cache.get(SITE_TOTALS_KEY)
+    if totals is None:
+        totals = Post.objects.aggregate(
+            posts=Count('pk'),
+            drafts=Count('pk', filter=Q(status='draft')),
+            published=Count('pk', filter=Q(status='published')),
+        )
+        totals['pending_comments'] = Comment.objects.filter(is_approved=False).count()
+        totals['users'] = User.objects.count()
+        totals['activity'] = summarize_activity()
+        cache.set(SITE_TOTALS_KEY, totals, get_timeout())
+    return totals
+
+
+def paginate_posts(queryset, number, count=None, fields=TABLE_FIELDS):
+    """A page of ``queryset`` with only the table columns loaded.
+
+    ``count`` is the already-known total, which saves the paginator its
+    ``COUNT(*)``; ``get_page`` copes if it is slightly stale.
+    """
+    paginator = Paginator(queryset.only(*fields).order_by('-created_at', '-pk'), PAGE_SIZE)
+    if count is not None:
+        paginator.count = count
+    return paginator.get_page(number)
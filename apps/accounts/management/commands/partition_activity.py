@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.accounts.retention import convert_to_partitioned, ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = (
+        'PostgreSQL only: convert the UserActivity table to monthly range '
+        'partitions (--convert) and create partitions ahead of time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true', help='Rebuild the table as a partitioned table.')
+        parser.add_argument('--months-ahead', type=int, default=2)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning is only supported on PostgreSQL.')
+        if not is_partitioned():
+            if not options['convert']:
+                raise CommandError('The activity table is not partitioned; pass --convert to rebuild it.')
+            convert_to_partitioned(options['months_ahead'])
+            self.stdout.write('Converted the activity table to monthly partitions.')
+        ensure_partitions(options['months_ahead'])
+        self.stdout.write(self.style.SUCCESS('Activity partitions are in place.'))
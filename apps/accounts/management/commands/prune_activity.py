@@ -0,0 +1,43 @@
+import gzip
+
+from django.core.management.base import BaseCommand
+
+from apps.accounts.models import UserActivity
+from apps.accounts.retention import ensure_partitions, is_partitioned, prune_activity, retention_cutoff, rollup_activity
+
+
+class Command(BaseCommand):
+    help = (
+        'Roll up, then delete UserActivity rows older than the retention '
+        'window in small batches. Daily rollups are kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Days of raw rows to keep (default: ACTIVITY_LOG RETENTION_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches.')
+        parser.add_argument('--archive', help='Append deleted rows as gzipped JSON lines to this file first.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would go.')
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options['days'])
+        if options['dry_run']:
+            expired = UserActivity.objects.filter(timestamp__lt=cutoff).count()
+            self.stdout.write(f'{expired} activity rows older than {cutoff:%Y-%m-%d} would be deleted.')
+            return
+
+        # Raw rows are gone after this, so their days must be summarised first
+        rollup_activity()
+        if is_partitioned():
+            ensure_partitions()
+
+        archive = gzip.open(options['archive'], 'at', encoding='utf-8') if options['archive'] else None
+        deleted = 0
+        try:
+            for count in prune_activity(cutoff, options['batch_size'], archive, options['pause']):
+                deleted += count
+                self.stdout.write(f'Deleted {deleted} rows...')
+        finally:
+            if archive is not None:
+                archive.close()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} activity rows older than {cutoff:%Y-%m-%d}.'))
@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired rows from the session table in small batches '
+        '(Django\'s clearsessions removes them in one statement).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would go.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now).order_by('expire_date')
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} expired sessions would be deleted.')
+            return
+        if settings.SESSION_ENGINE == 'django.contrib.sessions.backends.signed_cookies':
+            # Rows written before the switch still need to go
+            self.stdout.write('Sessions are kept in signed cookies; pruning rows left from before.')
+
+        deleted = 0
+        while True:
+            # Each batch is its own short transaction so logins are never
+            # blocked for long
+            with transaction.atomic():
+                keys = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+                if not keys:
+                    break
+                Session.objects.filter(pk__in=keys).delete()
+            deleted += len(keys)
+            self.stdout.write(f'Deleted {deleted} sessions...')
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired sessions.'))
@@ -0,0 +1,21 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from apps.accounts.retention import rollup_activity
+
+
+class Command(BaseCommand):
+    help = (
+        'Summarise UserActivity into daily per-user/path rollups. Without '
+        '--since it continues from the last rolled-up day; run it regularly '
+        '(e.g. hourly from cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='First day to recompute (YYYY-MM-DD).')
+        parser.add_argument('--until', type=date.fromisoformat, help='Last day to recompute (default: today).')
+
+    def handle(self, *args, **options):
+        written = rollup_activity(options['since'], options['until'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} daily activity rows.'))
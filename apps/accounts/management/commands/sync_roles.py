@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.accounts.models import User
+from apps.accounts.roles import ROLE_FLAGS, get_role_group
+
+
+class Command(BaseCommand):
+    help = (
+        'Bring every user\'s role group and staff/superuser flags in line with '
+        'their role using set-based queries. Optionally move all users of one '
+        'role to another first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-role', choices=list(ROLE_FLAGS))
+        parser.add_argument('--to-role', choices=list(ROLE_FLAGS))
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        from_role, to_role = options['from_role'], options['to_role']
+        if bool(from_role) != bool(to_role):
+            raise CommandError('--from-role and --to-role must be given together.')
+
+        Membership = User.groups.through
+        groups = {role: get_role_group(role) for role in ROLE_FLAGS}
+        group_ids = {group.pk for group in groups.values()}
+
+        with transaction.atomic():
+            if from_role:
+                # update() skips the per-user post_save role sync on purpose
+                moved = User.objects.filter(role=from_role).update(role=to_role)
+                self.stdout.write(f'Moved {moved} users from {from_role} to {to_role}.')
+
+            for role, (is_staff, is_superuser) in ROLE_FLAGS.items():
+                users = User.objects.filter(role=role)
+                flagged = users.exclude(is_staff=is_staff, is_superuser=is_superuser).update(
+                    is_staff=is_staff, is_superuser=is_superuser,
+                )
+                removed, _ = Membership.objects.filter(
+                    user__role=role, group_id__in=group_ids - {groups[role].pk},
+                ).delete()
+                # Materialise the ids before inserting into the table the
+                # query reads from
+                missing = list(users.exclude(groups=groups[role]).values_list('pk', flat=True))
+                Membership.objects.bulk_create(
+                    [Membership(user_id=user_id, group_id=groups[role].pk) for user_id in missing],
+                    batch_size=options['batch_size'],
+                    ignore_conflicts=True,
+                )
+                added = len(missing)
+                self.stdout.write(
+                    f'{role}: {flagged} flag updates, {removed} stale memberships removed, {added} added.'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Roles synchronised.'))
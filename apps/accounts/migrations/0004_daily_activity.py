@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_activity_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('activity_type', models.CharField(max_length=50)),
+                ('path', models.CharField(blank=True, max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_activities', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Activities',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['day'], name='accounts_daily_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'activity_type', 'path'), name='accounts_dailyactivity_unique')],
+            },
+        ),
+    ]
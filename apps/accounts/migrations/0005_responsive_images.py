@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:51
+
+import advanced_blog.images
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_daily_activity'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='profile_picture',
+            field=advanced_blog.images.ResponsiveImageField(blank=True, null=True, upload_to='profile_pics/'),
+        ),
+    ]
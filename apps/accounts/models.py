@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+
+from advanced_blog.images import ResponsiveImageField
 
 class User(AbstractUser):
     ROLES = (
@@ -12,13 +12,28 @@ class User(AbstractUser):
     
     role = models.CharField(max_length=10, choices=ROLES, default='reader')
     bio = models.TextField(max_length=500, blank=True)
-    profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    profile_picture = ResponsiveImageField(upload_to='profile_pics/', blank=True, null=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored role so role sync can skip unchanged saves
+        if 'role' in field_names:
+            instance._loaded_role = values[field_names.index('role')]
+        return instance
+
+    def save(self, *args, **kwargs):
+        self._old_role = getattr(self, '_loaded_role', None)
+        super().save(*args, **kwargs)
+        if 'role' not in self.get_deferred_fields():
+            self._loaded_role = self.role
 
     def __str__(self):
         return self.username
 
 class UserActivity(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activities')
+    # Indexed through accounts_activity_user_ts_idx (user is its leading column)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activities', db_index=False)
     activity_type = models.CharField(max_length=50)  # e.g., 'post_created', 'comment_added'
     timestamp = models.DateTimeField(auto_now_add=True)
     details = models.JSONField(default=dict)
@@ -26,15 +41,42 @@ class UserActivity(models.Model):
     class Meta:
         verbose_name_plural = 'User Activities'
         ordering = ['-timestamp']
+        indexes = [
+            # Admin listing and retention sweeps by age
+            models.Index(fields=['timestamp'], name='accounts_activity_ts_idx'),
+            # A user's recent activity
+            models.Index(fields=['user', 'timestamp'], name='accounts_activity_user_ts_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} - {self.activity_type} at {self.timestamp}'
 
-@receiver(post_save, sender='blog.Post')
-def notify_post_published(sender, instance, created, **kwargs):
-    if instance.status == 'published':
-        UserActivity.objects.create(
-            user=instance.author,
-            activity_type='post_published',
-            details={'post_id': instance.id, 'post_title': instance.title}
-        )
+
+class DailyActivity(models.Model):
+    """Activity counts per user, type and path for one day.
+
+    Built from UserActivity by ``apps.accounts.retention.rollup_activity`` and
+    kept after the raw rows are pruned.
+    """
+    # Indexed through accounts_dailyactivity_unique (user is its leading column)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_activities', db_index=False)
+    day = models.DateField()
+    activity_type = models.CharField(max_length=50)
+    path = models.CharField(max_length=255, blank=True)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Daily Activities'
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'day', 'activity_type', 'path'], name='accounts_dailyactivity_unique',
+            ),
+        ]
+        indexes = [
+            # Site-wide totals for a date range
+            models.Index(fields=['day'], name='accounts_daily_day_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} {self.activity_type} {self.path} on {self.day}: {self.count}'
@@ -0,0 +1,278 @@
+"""Retention, daily rollups and optional partitioning for UserActivity.
+
+Raw activity rows are only needed for a bounded window.  Before they are
+pruned they are summarised into ``DailyActivity`` (one row per user, type,
+path and day), which is what the dashboard and admin read.
+
+    rollup_activity()       recompute rollups from the last rolled-up day on
+    prune_activity(cutoff)  delete rows older than cutoff in short batches
+    retention_cutoff()      midnight ``RETENTION_DAYS`` ago
+
+Days are always recomputed whole and the cutoff falls on a day boundary, so
+a day's rollups are never rebuilt from a partially pruned day.
+
+On PostgreSQL the table can be converted to monthly range partitions
+(``manage.py partition_activity --convert``); expired months are then
+dropped outright instead of deleted row by row.
+"""
+import json
+import re
+import time as time_module
+from datetime import date, datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Count, Max, Sum, TextField, Value
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .activity import get_config
+from .models import DailyActivity, UserActivity
+
+TABLE = UserActivity._meta.db_table
+PARTITION_RE = re.compile(r'_p(\d{4})_(\d{2})$')
+ARCHIVE_FIELDS = ('id', 'user_id', 'activity_type', 'timestamp', 'details')
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def retention_cutoff(days=None):
+    if days is None:
+        days = get_config()['RETENTION_DAYS']
+    return day_bounds(timezone.localdate() - timedelta(days=days))[0]
+
+
+def rollup_day(day, batch_size=1000):
+    """Recompute the rollups for one day; returns the number of rows written."""
+    start, end = day_bounds(day)
+    rows = (
+        UserActivity.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        .order_by()
+        .values('user_id', 'activity_type', path=Coalesce(KeyTextTransform('path', 'details'), Value(''), output_field=TextField()))
+        .annotate(total=Count('pk'))
+    )
+    counts = {}
+    for row in rows:
+        # Paths longer than the column collapse onto the same key
+        key = (row['user_id'], row['activity_type'], row['path'][:255])
+        counts[key] = counts.get(key, 0) + row['total']
+    DailyActivity.objects.bulk_create(
+        [
+            DailyActivity(user_id=user_id, day=day, activity_type=activity_type, path=path, count=count)
+            for (user_id, activity_type, path), count in counts.items()
+        ],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['user', 'day', 'activity_type', 'path'],
+        update_fields=['count'],
+    )
+    return len(counts)
+
+
+def rollup_activity(start=None, end=None):
+    """Roll up every day from ``start`` through ``end`` (default: today).
+
+    Without ``start`` the run picks up at the latest rolled-up day, which
+    may have been partial, so regular runs only touch a day or two.
+    """
+    if start is None:
+        start = DailyActivity.objects.aggregate(day=Max('day'))['day']
+    if start is None:
+        first = UserActivity.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if first is None:
+            return 0
+        start = timezone.localtime(first).date()
+    end = end or timezone.localdate()
+    written = 0
+    day = start
+    while day <= end:
+        written += rollup_day(day)
+        day += timedelta(days=1)
+    return written
+
+
+def write_archive(rows, archive):
+    for row in rows:
+        archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+
+
+def prune_activity(cutoff, batch_size=5000, archive=None, pause=0):
+    """Delete rows older than ``cutoff``, yielding the size of each batch.
+
+    Every batch is its own short transaction so writers are never blocked
+    for long.  Rows are written to ``archive`` (a text file) as JSON lines
+    before they are deleted.
+    """
+    if is_partitioned():
+        yield from drop_expired_partitions(cutoff, archive)
+    expired = UserActivity.objects.filter(timestamp__lt=cutoff).order_by('timestamp')
+    while True:
+        with transaction.atomic():
+            if archive is not None:
+                rows = list(expired.values(*ARCHIVE_FIELDS)[:batch_size])
+                write_archive(rows, archive)
+                ids = [row['id'] for row in rows]
+            else:
+                ids = list(expired.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return
+            UserActivity.objects.filter(pk__in=ids).delete()
+        yield len(ids)
+        if pause:
+            time_module.sleep(pause)
+
+
+def summarize_activity(days=30, user=None):
+    """Page-visit totals for the last ``days`` days, read from the rollups."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    visits = DailyActivity.objects.filter(day__gte=since, activity_type='page_visit')
+    if user is not None:
+        visits = visits.filter(user=user)
+    totals = visits.aggregate(visits=Sum('count'), active_users=Count('user', distinct=True))
+    return {
+        'days': days,
+        'visits': totals['visits'] or 0,
+        'active_users': totals['active_users'],
+        'top_paths': list(
+            visits.values('path').annotate(visits=Sum('count')).order_by('-visits', 'path')[:5]
+        ),
+    }
+
+
+# PostgreSQL partitioning ---------------------------------------------------
+
+def month_start(moment):
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return day.replace(year=day.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def list_partitions():
+    """``{month: partition name}`` for every monthly partition."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = to_regclass(%s)',
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = PARTITION_RE.search(name)
+        if match:
+            partitions[date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+def create_partition(month, parent=TABLE):
+    start = day_bounds(month)[0]
+    end = day_bounds(add_months(month, 1))[0]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {quote(partition_name(month))} '
+            f'PARTITION OF {quote(parent)} FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+
+
+def ensure_partitions(months_ahead=2):
+    """Create this month's partition and the next ``months_ahead``."""
+    month = month_start(timezone.now())
+    for offset in range(months_ahead + 1):
+        create_partition(add_months(month, offset))
+
+
+def drop_expired_partitions(cutoff, archive=None):
+    """Drop monthly partitions that end on or before ``cutoff``."""
+    quote = connection.ops.quote_name
+    for month, name in sorted(list_partitions().items()):
+        if day_bounds(add_months(month, 1))[0] > cutoff:
+            continue
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT count(*) FROM {quote(name)}')
+                count = cursor.fetchone()[0]
+                if archive is not None:
+                    start, end = day_bounds(month)[0], day_bounds(add_months(month, 1))[0]
+                    rows = UserActivity.objects.filter(timestamp__gte=start, timestamp__lt=end)
+                    write_archive(rows.values(*ARCHIVE_FIELDS).iterator(chunk_size=5000), archive)
+                cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}')
+                cursor.execute(f'DROP TABLE {quote(name)}')
+        yield count
+
+
+def convert_to_partitioned(months_ahead=2):
+    """Rebuild the activity table as monthly range partitions on timestamp.
+
+    Copies every row inside one transaction, so run it in a maintenance
+    window.  The primary key becomes ``(id, timestamp)`` because PostgreSQL
+    requires the partition key in unique constraints; ids continue from the
+    old maximum.
+    """
+    quote = connection.ops.quote_name
+    new = f'{TABLE}_partitioned'
+    fields = {field.name: field for field in UserActivity._meta.concrete_fields}
+    names = ('user', 'activity_type', 'timestamp', 'details')
+    column_sql = ', '.join(
+        f'{quote(fields[name].column)} {fields[name].db_type(connection)} NOT NULL' for name in names
+    )
+    columns = ', '.join(quote(column) for column in ['id', *(fields[name].column for name in names)])
+    user_table = fields['user'].related_model._meta.db_table
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT min("timestamp") FROM {quote(TABLE)}')
+            oldest = cursor.fetchone()[0]
+            cursor.execute(
+                f'CREATE TABLE {quote(new)} ('
+                f'id bigint GENERATED BY DEFAULT AS IDENTITY, {column_sql}, '
+                f'PRIMARY KEY (id, "timestamp")'
+                f') PARTITION BY RANGE ("timestamp")'
+            )
+            # Catches rows outside the monthly partitions (clock skew, imports)
+            cursor.execute(f'CREATE TABLE {quote(TABLE + "_default")} PARTITION OF {quote(new)} DEFAULT')
+            month = month_start(oldest or timezone.now())
+            last = add_months(month_start(timezone.now()), months_ahead)
+            while month <= last:
+                create_partition(month, parent=new)
+                month = add_months(month, 1)
+            cursor.execute(f'INSERT INTO {quote(new)} ({columns}) SELECT {columns} FROM {quote(TABLE)}')
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), coalesce(max(id), 0) + 1, false) "
+                f'FROM {quote(new)}',
+                [new],
+            )
+            cursor.execute(f'DROP TABLE {quote(TABLE)}')
+            cursor.execute(f'ALTER TABLE {quote(new)} RENAME TO {quote(TABLE)}')
+            cursor.execute(
+                f'ALTER TABLE {quote(TABLE)} RENAME CONSTRAINT {quote(new + "_pkey")} TO {quote(TABLE + "_pkey")}'
+            )
+            cursor.execute(
+                f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(TABLE + "_user_id_fk")} '
+                f'FOREIGN KEY ({quote(fields["user"].column)}) REFERENCES {quote(user_table)} (id) '
+                f'DEFERRABLE INITIALLY DEFERRED'
+            )
+        with connection.schema_editor() as editor:
+            for index in UserActivity._meta.indexes:
+                editor.add_index(UserActivity, index)
@@ -0,0 +1,58 @@
+"""Role -> group and permission flag synchronisation.
+
+Each role maps to a ``Group`` named after it and to fixed ``is_staff`` /
+``is_superuser`` flags.  The three groups are created by migration and
+cached per process, so syncing a user costs no group lookups; a cached
+group that no longer exists is looked up again.
+"""
+from django.contrib.auth.models import Group
+from django.db import IntegrityError, connection, transaction
+
+# role: (is_staff, is_superuser)
+ROLE_FLAGS = {
+    'admin': (True, True),
+    'author': (True, False),
+    'reader': (False, False),
+}
+
+_role_groups = {}
+
+
+def get_role_group(role):
+    group = _role_groups.get(role)
+    if group is None:
+        group, _ = Group.objects.get_or_create(name=role.title())
+        _role_groups[role] = group
+    return group
+
+
+def clear_role_group_cache(**kwargs):
+    _role_groups.clear()
+
+
+def set_role_group(user, created):
+    if not created:
+        # Only role groups are touched; other group memberships are kept
+        user.groups.remove(*(get_role_group(role) for role in ROLE_FLAGS if role != user.role))
+    user.groups.add(get_role_group(user.role))
+
+
+def apply_role(user, created=False):
+    """Put ``user`` in its role group and set its flags, without save()."""
+    from .models import User
+
+    try:
+        with transaction.atomic():
+            set_role_group(user, created)
+            # A group deleted and recreated by another process leaves a dead
+            # pk in this process's cache.  Foreign keys are checked at commit,
+            # so check the new memberships now, while they can be redone.
+            connection.check_constraints(table_names=[User.groups.through._meta.db_table])
+    except IntegrityError:
+        clear_role_group_cache()
+        set_role_group(user, created)
+
+    is_staff, is_superuser = ROLE_FLAGS[user.role]
+    if (user.is_staff, user.is_superuser) != (is_staff, is_superuser):
+        User.objects.filter(pk=user.pk).update(is_staff=is_staff, is_superuser=is_superuser)
+        user.is_staff, user.is_superuser = is_staff, is_superuser
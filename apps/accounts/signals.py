@@ -1,32 +1,21 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import Group
 from .models import User
+from .roles import apply_role, clear_role_group_cache
 
 @receiver(post_save, sender=User)
-def assign_user_role_group(sender, instance, created, **kwargs):
+def assign_user_role_group(sender, instance, created, update_fields=None, **kwargs):
     """
     Assign user to appropriate role group when user is created or role is changed
     """
-    if created or instance.role not in [g.name.lower() for g in instance.groups.all()]:
-        # Remove user from all role groups
-        instance.groups.clear()
-        
-        # Get or create the role group
-        role_group, _ = Group.objects.get_or_create(name=instance.role.title())
-        
-        # Add user to the appropriate role group
-        instance.groups.add(role_group)
+    # Logins save only last_login; most other saves leave the role alone
+    if update_fields is not None and 'role' not in update_fields:
+        return
+    if not created and getattr(instance, '_old_role', None) == instance.role:
+        return
+    apply_role(instance, created=created)
 
-        # Set appropriate permissions based on role
-        if instance.role == 'admin':
-            instance.is_staff = True
-            instance.is_superuser = True
-        elif instance.role == 'author':
-            instance.is_staff = True
-            instance.is_superuser = False
-        else:  # reader
-            instance.is_staff = False
-            instance.is_superuser = False
-        
-        instance.save()
\ No newline at end of file
+
+post_save.connect(clear_role_group_cache, sender=Group)
+post_delete.connect(clear_role_group_cache, sender=Group)
@@ -1,3 +1,276 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.blog.models import Category, Comment, Post
+from .activity import ActivitySink
+from .dashboard import author_stats
+from .models import DailyActivity, User, UserActivity
+from .retention import prune_activity, retention_cutoff, rollup_activity
+from .roles import clear_role_group_cache, get_role_group
+from . import roles
+
+
+class RoleSyncTests(TestCase):
+    def role_groups(self, user):
+        return sorted(user.groups.values_list('name', flat=True))
+
+    def test_new_user_gets_role_group_and_flags(self):
+        user = User.objects.create_user('ada', password='pass12345', role='admin')
+        user.refresh_from_db()
+        self.assertEqual(self.role_groups(user), ['Admin'])
+        self.assertTrue(user.is_staff and user.is_superuser)
+
+    def test_role_change_moves_group_and_keeps_other_groups(self):
+        user = User.objects.create_user('bob', password='pass12345', role='reader')
+        editors = Group.objects.create(name='Editors')
+        user.groups.add(editors)
+        user = User.objects.get(pk=user.pk)
+        user.role = 'author'
+        user.save()
+        user.refresh_from_db()
+        self.assertEqual(self.role_groups(user), ['Author', 'Editors'])
+        self.assertTrue(user.is_staff)
+        self.assertFalse(user.is_superuser)
+
+    def test_login_and_unchanged_saves_skip_role_sync(self):
+        user = User.objects.create_user('cy', password='pass12345', role='author')
+        user = User.objects.get(pk=user.pk)
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+        with self.assertNumQueries(1):
+            user.first_name = 'Cy'
+            user.save()
+        self.assertTrue(self.client.login(username='cy', password='pass12345'))
+
+    def test_stale_cached_group_is_looked_up_again(self):
+        # Another process deletes and recreates the group; this one still
+        # has the old instance cached
+        self.addCleanup(clear_role_group_cache)
+        stale = get_role_group('author')
+        Group.objects.filter(pk=stale.pk).delete()
+        recreated = Group.objects.create(name='Author')
+        roles._role_groups['author'] = stale
+        user = User.objects.create_user('dee', password='pass12345', role='author')
+        self.assertEqual(list(user.groups.all()), [recreated])
+        self.assertEqual(get_role_group('author'), recreated)
+
+    def test_sync_roles_command(self):
+        users = [User.objects.create_user(f'u{i}', password='pass12345', role='reader') for i in range(3)]
+        User.objects.filter(pk=users[0].pk).update(is_staff=True)
+        call_command('sync_roles', from_role='reader', to_role='author', stdout=StringIO())
+        for user in User.objects.filter(pk__in=[u.pk for u in users]):
+            self.assertEqual(self.role_groups(user), ['Author'])
+            self.assertEqual((user.role, user.is_staff, user.is_superuser), ('author', True, False))
+
+
+class ManualSink(ActivitySink):
+    """A sink whose flusher thread exits at once, so tests flush explicitly."""
+
+    def _run(self):
+        pass
+
+
+@override_settings(ACTIVITY_LOG={'BATCH_SIZE': 2, 'FLUSH_INTERVAL': 60, 'MAX_QUEUE': 2})
+class ActivitySinkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('visitor', password='pass12345', role='reader')
+
+    def setUp(self):
+        self.sink = ManualSink()
+
+    def record(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(count):
+                self.sink.record(self.user, 'page_visit', {'path': f'/{i}/'})
+
+    def test_events_are_written_in_batches(self):
+        self.record(2)
+        self.assertTrue(self.sink._wake.is_set())
+        self.assertEqual(UserActivity.objects.count(), 0)
+        self.assertEqual(self.sink.flush(), 2)
+        self.record(1)
+        self.assertEqual(self.sink.flush(), 1)
+        self.assertEqual(
+            sorted(UserActivity.objects.values_list('details__path', flat=True)), ['/0/', '/0/', '/1/'],
+        )
+        stats = self.sink.stats()
+        self.assertEqual((stats['queued'], stats['flushed'], stats['flushes'], stats['pending']), (3, 3, 2, 0))
+
+    def test_full_queue_drops_new_events(self):
+        self.record(3)
+        self.assertEqual((self.sink.queued, self.sink.dropped), (2, 1))
+        self.assertEqual(self.sink.flush(), 2)
+
+    @override_settings(ACTIVITY_LOG={'MAX_QUEUE': 2, 'OVERFLOW': 'block', 'BLOCK_TIMEOUT': 0.2})
+    def test_blocking_overflow_waits_for_room_then_drops(self):
+        self.record(2)
+        # Room freed while the request waits is used
+        drain = threading.Timer(0.02, self.sink._drain, args=[1])
+        drain.start()
+        self.record(1)
+        drain.join()
+        self.assertEqual((self.sink.queued, self.sink.dropped), (3, 0))
+        started = time.monotonic()
+        self.record(1)
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual((self.sink.queued, self.sink.dropped), (3, 1))
+
+    def test_rolled_back_transactions_queue_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.sink.record(self.user, 'page_visit')
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.sink.stats()['queued'], 0)
+
+
+class ActivityRetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('dee', password='pass12345', role='author')
+
+    def visit(self, path, days_ago=0):
+        activity = UserActivity.objects.create(
+            user=self.user, activity_type='page_visit', details={'path': path, 'method': 'GET'},
+        )
+        # auto_now_add ignores explicit values
+        UserActivity.objects.filter(pk=activity.pk).update(timestamp=timezone.now() - timedelta(days=days_ago))
+
+    def test_rollup_counts_visits_per_day_and_path(self):
+        self.visit('/', days_ago=2)
+        self.visit('/', days_ago=2)
+        self.visit('/tags/', days_ago=2)
+        self.visit('/')
+        rollup_activity()
+        old_day = timezone.localdate() - timedelta(days=2)
+        self.assertEqual(DailyActivity.objects.get(day=old_day, path='/').count, 2)
+        self.assertEqual(DailyActivity.objects.get(day=old_day, path='/tags/').count, 1)
+
+        # Re-running continues from the latest day and updates it in place
+        self.visit('/')
+        rollup_activity()
+        self.assertEqual(DailyActivity.objects.get(day=timezone.localdate(), path='/').count, 2)
+        self.assertEqual(DailyActivity.objects.count(), 3)
+
+    def test_prune_deletes_expired_rows_in_batches_and_keeps_rollups(self):
+        for _ in range(5):
+            self.visit('/', days_ago=100)
+        self.visit('/')
+        out = StringIO()
+        call_command('prune_activity', days=90, batch_size=2, stdout=out)
+        self.assertIn('Deleted 5 activity rows', out.getvalue())
+        self.assertEqual(UserActivity.objects.count(), 1)
+        self.assertEqual(
+            DailyActivity.objects.get(day=timezone.localdate() - timedelta(days=100)).count, 5,
+        )
+        self.assertEqual(list(prune_activity(retention_cutoff(90))), [])
+
+    def test_dashboard_reads_rollups(self):
+        self.visit('/about/')
+        rollup_activity()
+        UserActivity.objects.all().delete()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('accounts:dashboard'))
+        self.assertContains(response, 'Your page visits: 1')
+        self.assertContains(response, '/about/')
+
+
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('boss', password='pass12345', role='admin')
+        cls.author = User.objects.create_user('penn', password='pass12345', role='author')
+        category = Category.objects.create(name='Dash')
+        for i in range(25):
+            post = Post.objects.create(
+                title=f'Dash post {i}', content='<p>body</p>', author=cls.author,
+                category=category, status='draft' if i % 5 == 0 else 'published',
+            )
+        Comment.objects.create(post=post, user=cls.admin, content='Pending')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_author_stats_come_from_one_query(self):
+        with self.assertNumQueries(1):
+            stats = author_stats(self.author)
+        self.assertEqual(stats, {'posts': 25, 'drafts': 5, 'published': 20, 'pending_comments': 1})
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_admin_dashboard_is_paginated_and_caches_site_totals(self):
+        self.client.force_login(self.admin)
+        url = reverse('accounts:dashboard')
+        response = self.client.get(url, {'all_page': 2})
+        self.assertEqual(len(response.context['all_posts_page']), 5)
+        self.assertContains(response, 'Total users: 2')
+        self.assertContains(response, 'All pending comments: 1')
+
+        # Site totals are cached.  Left: user, own stats, the all-posts page
+        # and two activity rollup queries; the admin has no posts, so the
+        # known count of 0 skips their page query.  The session comes from
+        # the cache (cached_db sessions)
+        with self.assertNumQueries(5):
+            self.client.get(url)
+
+
+class SessionStorageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('sessioned', password='pass12345')
+
+    def setUp(self):
+        cache.clear()
+
+    def profile_queries(self, engine):
+        """Queries for a signed-in profile page once the session is warm."""
+        with self.settings(SESSION_ENGINE=engine):
+            client = Client()
+            client.force_login(self.user)
+            url = reverse('accounts:profile')
+            client.get(url)
+            with CaptureQueriesContext(connection) as ctx:
+                client.get(url)
+        return [query['sql'] for query in ctx.captured_queries]
+
+    def test_cached_and_cookie_sessions_skip_the_session_select(self):
+        session_table = Session._meta.db_table
+        db_queries = self.profile_queries('django.contrib.sessions.backends.db')
+        self.assertEqual(sum(session_table in sql for sql in db_queries), 1)
+        for engine in ('cached_db', 'signed_cookies'):
+            queries = self.profile_queries(f'django.contrib.sessions.backends.{engine}')
+            self.assertFalse([sql for sql in queries if session_table in sql], engine)
+            self.assertEqual(len(queries), len(db_queries) - 1, engine)
+
+    def test_messages_travel_in_a_cookie(self):
+        self.client.force_login(self.user)
+        session_key = self.client.session.session_key
+        response = self.client.post(reverse('accounts:profile_edit'), {'email': 'sessioned@example.com'})
+        self.assertRedirects(response, reverse('accounts:profile'), fetch_redirect_response=False)
+        self.assertIn('messages', response.cookies)
+        self.assertNotIn('_messages', SessionStore(session_key).load())
+
+    def test_prune_sessions_deletes_expired_rows_in_batches(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(session_key=f'expired-{i}', session_data='', expire_date=now - timedelta(days=1))
+        Session.objects.create(session_key='live', session_data='', expire_date=now + timedelta(days=1))
+        out = StringIO()
+        call_command('prune_sessions', batch_size=2, stdout=out)
+        self.assertIn('Deleted 5 expired sessions', out.getvalue())
+        self.assertEqual(list(Session.objects.values_list('pk', flat=True)), ['live'])
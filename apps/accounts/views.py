@@ -4,6 +4,8 @@ from django.views.generic import CreateView, UpdateView, DetailView, TemplateVie
 from django.urls import reverse_lazy
 from django.contrib import messages
 from .models import User
+from .dashboard import TABLE_FIELDS, author_stats, paginate_posts, site_totals
+from .retention import summarize_activity
 from .forms import CustomUserCreationForm
 from apps.blog.models import Post
 from django.contrib.auth import views as auth_views
@@ -79,10 +81,16 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         user = self.request.user
         if user.role in ['admin', 'author']:
-            context['posts'] = Post.objects.filter(author=user).order_by('-created_at')
-            context['draft_posts'] = context['posts'].filter(status='draft')
-            context['published_posts'] = context['posts'].filter(status='published')
+            context['stats'] = stats = author_stats(user)
+            context['posts_page'] = paginate_posts(
+                Post.objects.filter(author=user), self.request.GET.get('page'), stats['posts'],
+            )
             if user.role == 'admin':
-                context['all_posts'] = Post.objects.all().order_by('-created_at')
-                context['total_users'] = User.objects.count()
+                context['site_totals'] = totals = site_totals()
+                context['all_posts_page'] = paginate_posts(
+                    Post.objects.select_related('author'), self.request.GET.get('all_page'),
+                    totals['posts'], fields=(*TABLE_FIELDS, 'author__username'),
+                )
+        # Read from the daily rollups; the raw activity table is pruned
+        context['activity'] = summarize_activity(user=user)
         return context
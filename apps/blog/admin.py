@@ -17,7 +17,7 @@ class TagAdmin(admin.ModelAdmin):
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('title', 'author', 'category', 'status', 'created_at')
+    list_display = ('title', 'author', 'category', 'status', 'approved_comment_count', 'created_at')
     list_filter = ('status', 'created_at', 'category')
     search_fields = ('title', 'content')
     prepopulated_fields = {'slug': ('title',)}
@@ -34,5 +34,12 @@ class CommentAdmin(admin.ModelAdmin):
     actions = ['approve_comments']
 
     def approve_comments(self, request, queryset):
-        queryset.update(is_approved=True)
+        # One UPDATE; approve() also refreshes post counts and cached pages
+        queryset.approve()
     approve_comments.short_description = 'Approve selected comments'
+
+    def delete_model(self, request, obj):
+        Comment.objects.filter(pk=obj.pk).remove()
+
+    def delete_queryset(self, request, queryset):
+        queryset.remove()
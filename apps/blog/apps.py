@@ -6,6 +6,7 @@ class BlogConfig(AppConfig):
     name = 'apps.blog'
     
     def ready(self):
+        from . import checks  # noqa: F401  Register system checks
         # Import signal handlers
         try:
             import apps.blog.signals  # noqa: F401
@@ -0,0 +1,81 @@
+"""Async versions of the public read views, for ASGI deployments.
+
+Under ASGI a sync view holds a thread for the whole request, including
+every database round trip.  These views keep the sync views' templates,
+context and caching (they subclass them) but run their queries through the
+async ORM, so the event loop serves other requests while they wait.  The
+page cache and conditional GET mixins (apps.blog.cache) switch to the async
+cache API for them.
+
+Templates still render in a worker thread, as Django does for every async
+view; what they query (the sidebar, cached article fragments) runs there.
+Full-text search and comment submission run their sync code in a single
+thread hop: the search index is queried with raw SQL, which has no async
+API.
+
+apps/blog/urls.py serves these instead of the sync views when
+``BLOG_ASYNC_VIEWS`` is on, which the ASGI profile in gunicorn.conf.py does.
+"""
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404
+
+from . import views
+from .cache import aget_versions
+from .models import Category, Post, Tag
+from .slugs import aresolve_slug
+from .threads import aload_threads
+
+
+class AsyncListingMixin:
+    """Fetch a ListView's page through the async ORM, then render as usual."""
+
+    async def aget_queryset(self):
+        return self.get_queryset()
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = await self.aget_queryset()
+        self.paginated = await self.apaginate_queryset(self.object_list, self.get_paginate_by(self.object_list))
+        return self.render_to_response(self.get_context_data())
+
+    def paginate_queryset(self, queryset, page_size):
+        # Already fetched by get()
+        return self.paginated
+
+
+class PostListView(AsyncListingMixin, views.PostListView):
+    pass
+
+
+class CategoryPostListView(AsyncListingMixin, views.CategoryPostListView):
+    async def aget_queryset(self):
+        self.category = await aresolve_slug(Category, self.kwargs['slug'])
+        return Post.published.for_listing().filter(category=self.category)
+
+
+class TagPostListView(AsyncListingMixin, views.TagPostListView):
+    async def aget_queryset(self):
+        self.tag = await aresolve_slug(Tag, self.kwargs['slug'])
+        return Post.published.for_listing().filter(tags=self.tag)
+
+
+class PostDetailView(views.PostDetailView):
+    async def aget_object(self):
+        if not hasattr(self, '_object'):
+            self._object = await aget_object_or_404(self.get_queryset(), slug=self.kwargs['slug'])
+        return self._object
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        context = self.get_context_data(
+            threads=await aload_threads(self.object, request.GET.get('cursor')),
+            fragment_version='-'.join(map(str, await aget_versions(self.get_cache_scopes()))),
+        )
+        return self.render_to_response(context)
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(super().post)(request, *args, **kwargs)
+
+
+class PostSearchView(views.PostSearchView):
+    async def get(self, request, *args, **kwargs):
+        return await sync_to_async(super().get)(request, *args, **kwargs)
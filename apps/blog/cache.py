@@ -0,0 +1,318 @@
+"""Rendered-page cache for public blog pages.
+
+Pages are cached per URL for anonymous visitors.  Each cache key embeds the
+current version of one or more *scopes*; saving a post, approving a comment
+or renaming a category bumps the versions of exactly the scopes it affects,
+so stale entries are never looked up again and simply expire.
+
+Scopes in use:
+    posts               anything that lists posts (home page)
+    post:<slug>         a post detail page
+    category:<slug>     a category listing
+    tag:<slug>          a tag listing
+    taxonomy            category/tag names shown on every page
+    sidebar             category/tag post counts (apps.blog.sidebar)
+
+Versions are nanosecond timestamps, so they double as modification times
+for ``ConditionalGetMixin``'s ``Last-Modified``.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+VERSION_KEY = 'blog:version:%s'
+# Response headers stored with a cached page
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+MESSAGES_COOKIE = 'messages'
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+page_cache_stats = CacheStats()
+
+
+def get_timeout():
+    return getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 300)
+
+
+def get_versions(scopes):
+    keys = [VERSION_KEY % scope for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        # A fresh, time-based version means an evicted counter can never
+        # resurrect entries written under an older version.
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(scopes):
+    keys = [VERSION_KEY % scope for scope in scopes]
+    versions = await cache.aget_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        await cache.aset_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*scopes):
+    """Bump the version of every scope so cached pages using it are skipped."""
+    version = time.time_ns()
+    cache.set_many({VERSION_KEY % scope: version for scope in set(scopes)}, None)
+    page_cache_stats.incr('invalidations', len(set(scopes)))
+
+
+def invalidate_post(post, extra_scopes=(), with_tags=True):
+    scopes = ['posts', 'sidebar', f'post:{post.slug}', *extra_scopes]
+    if post.category_id:
+        scopes.append(f'category:{post.category.slug}')
+    if with_tags and post.pk:
+        scopes.extend(f'tag:{slug}' for slug in post.tags.values_list('slug', flat=True))
+    invalidate(*scopes)
+
+
+def invalidate_posts(posts):
+    """Invalidate the pages of many posts with two lookups in total."""
+    from .models import Category, Tag
+
+    post_ids = [post.pk for post in posts]
+    category_slugs = Category.objects.filter(posts__in=post_ids).values_list('slug', flat=True).distinct()
+    tag_slugs = Tag.objects.filter(posts__in=post_ids).values_list('slug', flat=True).distinct()
+    invalidate(
+        'posts', 'sidebar',
+        *(f'post:{post.slug}' for post in posts),
+        *(f'category:{slug}' for slug in category_slugs),
+        *(f'tag:{slug}' for slug in tag_slugs),
+    )
+
+
+def page_cache_key(request, scopes, versions):
+    # Feeds and sitemaps embed absolute URLs built from the request, so a
+    # page cached for one (allowed) host must not be served to another
+    raw = '|'.join([request.scheme, request.get_host(), request.get_full_path(), *scopes, *map(str, versions)])
+    return 'blog:page:v3:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def is_cacheable(request, user):
+    # Pages for signed-in users carry per-user links, forms and CSRF tokens,
+    # and a pending flash message would be frozen into the page.
+    return (
+        request.method in ('GET', 'HEAD')
+        and MESSAGES_COOKIE not in request.COOKIES
+        and not user.is_authenticated
+    )
+
+
+class CachedPageMixin:
+    """Serve anonymous GETs from the page cache.
+
+    Views list the scopes their output depends on in ``get_cache_scopes()``.
+    Template responses are stored once rendered, streamed ones once the
+    last chunk is sent, anything else straight away; for validators to be
+    stored with a non-template response, ``ConditionalGetMixin`` must come
+    after this mixin.  Async views get the same through the async cache API.
+    """
+    cache_scopes = ()
+
+    def get_cache_scopes(self):
+        return ['taxonomy', *self.cache_scopes]
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.cached_adispatch(request, *args, **kwargs)
+        if not is_cacheable(request, request.user):
+            return super().dispatch(request, *args, **kwargs)
+
+        self.request, self.args, self.kwargs = request, args, kwargs
+        scopes = self.get_cache_scopes()
+        key = page_cache_key(request, scopes, get_versions(scopes))
+        cached = cache.get(key)
+        if cached is not None:
+            return self.cached_response(request, cached)
+        page_cache_stats.incr('misses')
+        return self.store_response(key, super().dispatch(request, *args, **kwargs))
+
+    async def cached_adispatch(self, request, *args, **kwargs):
+        if not is_cacheable(request, await request.auser()):
+            return await super().dispatch(request, *args, **kwargs)
+
+        self.request, self.args, self.kwargs = request, args, kwargs
+        scopes = self.get_cache_scopes()
+        key = page_cache_key(request, scopes, await aget_versions(scopes))
+        cached = await cache.aget(key)
+        if cached is not None:
+            return self.cached_response(request, cached)
+        page_cache_stats.incr('misses')
+        return self.store_response(key, await super().dispatch(request, *args, **kwargs))
+
+    def cached_response(self, request, cached):
+        page_cache_stats.incr('hits')
+        content, headers = cached
+        response = HttpResponse(content, headers=headers)
+        if 'ETag' not in headers:
+            return response
+        # Validators were stored with the page, so hits can answer 304
+        # without asking the view
+        return get_conditional_response(
+            request, etag=headers['ETag'],
+            last_modified=parse_http_date_safe(headers.get('Last-Modified')), response=response,
+        )
+
+    def store_response(self, key, response):
+        if response.status_code != 200:
+            return response
+
+        def store(r, content):
+            cache.set(key, (content, {name: r[name] for name in CACHED_HEADERS if r.has_header(name)}), get_timeout())
+
+        if hasattr(response, 'add_post_render_callback'):
+            response.add_post_render_callback(lambda r: store(r, r.content))
+        elif response.streaming:
+            response.streaming_content = self.tee(response, response.streaming_content, store)
+        else:
+            store(response, response.content)
+        return response
+
+    @staticmethod
+    def tee(response, chunks, store):
+        """Pass streamed chunks through, caching the whole body once sent."""
+        sent = []
+        for chunk in chunks:
+            sent.append(chunk)
+            yield chunk
+        store(response, b''.join(sent))
+
+
+class ConditionalGetMixin:
+    """Answer ``If-None-Match`` / ``If-Modified-Since`` with 304 Not Modified.
+
+    Views return their freshness data from ``get_conditional_state()``: a
+    dict from one aggregate query whose ``last_modified`` key is a datetime.
+    It is combined with the versions of the view's cache scopes (so
+    deletions and sidebar changes count too) and the user id into an ETag.
+    Unconditional requests only pay for the query when the page isn't
+    already cached, since cached pages keep their headers.
+    """
+
+    def get_conditional_state(self):
+        raise NotImplementedError
+
+    async def aget_conditional_state(self):
+        return await sync_to_async(self.get_conditional_state)()
+
+    def get_validators(self):
+        """Return ``(etag, last_modified)``, or ``(None, None)`` for a 404."""
+        state = self.get_conditional_state()
+        if not state or state.get('last_modified') is None:
+            return None, None
+        return self.make_validators(state, get_versions(self.get_cache_scopes()))
+
+    async def aget_validators(self):
+        state = await self.aget_conditional_state()
+        if not state or state.get('last_modified') is None:
+            return None, None
+        return self.make_validators(state, await aget_versions(self.get_cache_scopes()))
+
+    def make_validators(self, state, versions):
+        scopes = self.get_cache_scopes()
+        last_modified = max(
+            state['last_modified'],
+            datetime.fromtimestamp(max(versions) / 1e9, tz=dt_timezone.utc),
+        )
+        raw = '|'.join([
+            self.request.scheme, self.request.get_host(), self.request.get_full_path(), str(self.request.user.pk),
+            *(f'{name}={value}' for name, value in sorted(state.items())),
+            *scopes, *map(str, versions),
+        ])
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest()), last_modified
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.conditional_adispatch(request, *args, **kwargs)
+        if not self.is_conditional(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        self.request, self.args, self.kwargs = request, args, kwargs
+        validators = None
+        if self.has_validators(request):
+            validators = self.get_validators()
+            not_modified = self.not_modified(request, *validators)
+            if not_modified is not None:
+                return not_modified
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.has_header('ETag'):
+            self.set_validators(response, *(validators or self.get_validators()))
+        return response
+
+    async def conditional_adispatch(self, request, *args, **kwargs):
+        if not self.is_conditional(request):
+            return await super().dispatch(request, *args, **kwargs)
+
+        self.request, self.args, self.kwargs = request, args, kwargs
+        validators = None
+        if self.has_validators(request):
+            validators = await self.aget_validators()
+            not_modified = self.not_modified(request, *validators)
+            if not_modified is not None:
+                return not_modified
+
+        response = await super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.has_header('ETag'):
+            self.set_validators(response, *(validators or await self.aget_validators()))
+        return response
+
+    @staticmethod
+    def is_conditional(request):
+        # A pending flash message makes the page differ from what the
+        # client has cached
+        return request.method in ('GET', 'HEAD') and MESSAGES_COOKIE not in request.COOKIES
+
+    @staticmethod
+    def has_validators(request):
+        return 'If-None-Match' in request.headers or 'If-Modified-Since' in request.headers
+
+    def not_modified(self, request, etag, last_modified):
+        if etag:
+            response = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+            if response is not None:
+                return self.set_validators(response, etag, last_modified)
+        return None
+
+    def set_validators(self, response, etag, last_modified):
+        if etag:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
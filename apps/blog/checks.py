@@ -0,0 +1,75 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.checks import Error, Tags, Warning, register
+from django.utils.encoding import force_str
+
+
+def static_file_exists(path):
+    # A hashed name is listed in the manifest; an unhashed one has a source
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', None) or {}
+    return path in hashed_files.values() or finders.find(path) is not None
+
+
+@register(Tags.staticfiles)
+def check_ckeditor_contents_css(app_configs, **kwargs):
+    """Every CKEditor ``contentsCss`` entry must resolve to a static file.
+
+    Entries should be lazy ``static()`` URLs so they pick up hashed names; a
+    hardcoded ``/static/...`` path still works with WhiteNoise but is served
+    unhashed with a short cache lifetime.
+    """
+    errors = []
+    static_url = '/' + settings.STATIC_URL.lstrip('/')
+    manifest_built = bool(getattr(staticfiles_storage, 'hashed_files', True))
+    for config_name, config in getattr(settings, 'CKEDITOR_CONFIGS', {}).items():
+        entries = config.get('contentsCss', [])
+        if isinstance(entries, str):
+            entries = [entries]
+        for entry in entries:
+            label = f'CKEDITOR_CONFIGS[{config_name!r}] contentsCss'
+            try:
+                url = force_str(entry)
+            except ValueError as exc:
+                # The manifest storage can't resolve names before the first
+                # collectstatic (which runs these checks itself)
+                if manifest_built:
+                    errors.append(Error(f'{label} does not resolve: {exc}', id='blog.E001'))
+                continue
+            if not url.startswith(static_url):
+                continue
+            if not static_file_exists(url[len(static_url):]):
+                errors.append(Error(
+                    f'{label} {url!r} is not a static file.',
+                    hint='Fix the path or add the file under STATICFILES_DIRS.',
+                    id='blog.E001',
+                ))
+            elif isinstance(entry, str):
+                errors.append(Warning(
+                    f'{label} {url!r} is hardcoded.',
+                    hint="Use lazy(static, str)('...') so the hashed, long-cached file is served.",
+                    id='blog.W001',
+                ))
+    return errors
+
+
+@register(Tags.caches)
+def check_shared_page_cache(app_configs, **kwargs):
+    """The page cache's version keys must be shared by every worker."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    try:
+        workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+    except ValueError:
+        workers = 1
+    if backend.endswith('.LocMemCache') and workers > 1:
+        return [Error(
+            f'The page cache uses a per-process LocMemCache with {workers} workers.',
+            hint=(
+                'Invalidations would only reach the worker that made them, and the '
+                "others would keep serving stale pages; set DJANGO_CACHE_BACKEND to 'file' or 'redis'."
+            ),
+            id='blog.E002',
+        )]
+    return []
@@ -0,0 +1,128 @@
+"""RSS and Atom feeds of published posts.
+
+The site, every category and every tag have a feed in both formats listing
+their ``FEED_ITEMS`` newest posts with the stored excerpt.  Feeds go through
+the page cache under the same scopes as the matching listing, so the
+receivers in ``apps.blog.signals`` that invalidate listings when a post is
+published, edited or removed invalidate the feeds too, and they carry the
+listings' ETag / Last-Modified validators.  Like every cached page they
+also depend on the ``taxonomy`` scope, so renaming a category or tag
+refreshes the feed titles.
+"""
+from django.contrib.syndication.views import Feed
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.feedgenerator import Rss201rev2Feed
+from django.views.generic import View
+
+from .cache import CachedPageMixin
+from .models import Category, Post, Tag
+from .slugs import resolve_slug
+from .views import ListingConditionalGetMixin
+
+FEED_ITEMS = 20
+
+
+class PostFeed(Feed):
+    title = 'Advanced Blog'
+    description = 'The latest posts on Advanced Blog.'
+
+    def link(self):
+        return reverse('blog:home')
+
+    def get_queryset(self, obj):
+        return Post.published.for_listing()
+
+    def items(self, obj):
+        return self.get_queryset(obj)[:FEED_ITEMS]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.excerpt
+
+    def item_link(self, item):
+        return reverse('blog:post_detail', args=[item.slug])
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_pubdate(self, item):
+        return item.created_at
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_categories(self, item):
+        return [item.category.name, *(tag.name for tag in item.tags.all())]
+
+
+class CategoryPostFeed(PostFeed):
+    def get_object(self, request, slug):
+        return resolve_slug(Category, slug)
+
+    def title(self, obj):
+        return f'{obj.name} - Advanced Blog'
+
+    def description(self, obj):
+        return f'The latest posts in {obj.name}.'
+
+    def link(self, obj):
+        return reverse('blog:category_posts', args=[obj.slug])
+
+    def get_queryset(self, obj):
+        return super().get_queryset(obj).filter(category=obj)
+
+
+class TagPostFeed(PostFeed):
+    def get_object(self, request, slug):
+        return resolve_slug(Tag, slug)
+
+    def title(self, obj):
+        return f'#{obj.name} - Advanced Blog'
+
+    def description(self, obj):
+        return f'The latest posts tagged {obj.name}.'
+
+    def link(self, obj):
+        return reverse('blog:tag_posts', args=[obj.slug])
+
+    def get_queryset(self, obj):
+        return super().get_queryset(obj).filter(tags=obj)
+
+
+# CachedPageMixin comes first so the page is cached with the validators
+# ListingConditionalGetMixin adds
+class PostFeedView(CachedPageMixin, ListingConditionalGetMixin, View):
+    feed_class = PostFeed
+    # as_view(feed_type=Atom1Feed) serves the Atom version
+    feed_type = Rss201rev2Feed
+    cache_scopes = ('posts',)
+
+    def get(self, request, *args, **kwargs):
+        feed = self.feed_class()
+        feed.feed_type = self.feed_type
+        return feed(request, *args, **kwargs)
+
+
+class CategoryFeedView(PostFeedView):
+    feed_class = CategoryPostFeed
+    cache_scopes = ()
+
+    def get_listing_filter(self):
+        return Q(category__slug=self.kwargs['slug'])
+
+    def get_cache_scopes(self):
+        return super().get_cache_scopes() + [f"category:{self.kwargs['slug']}"]
+
+
+class TagFeedView(PostFeedView):
+    feed_class = TagPostFeed
+    cache_scopes = ()
+
+    def get_listing_filter(self):
+        return Q(tags__slug=self.kwargs['slug'])
+
+    def get_cache_scopes(self):
+        return super().get_cache_scopes() + [f"tag:{self.kwargs['slug']}"]
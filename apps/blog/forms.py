@@ -35,5 +35,10 @@ class PostForm(forms.ModelForm):
         # If editing an existing instance, prefill tags_input with existing tags
         super().__init__(*args, **kwargs)
         if self.instance and self.instance.pk:
+            # Served from the prefetch cache when the view prefetched tags
             tags_qs = self.instance.tags.all()
-            self.fields['tags_input'].initial = ', '.join([t.name for t in tags_qs])
\ No newline at end of file
+            self.fields['tags_input'].initial = ', '.join([t.name for t in tags_qs])
+
+    def clean_tags_input(self):
+        """The entered tag names as a list."""
+        return [name.strip() for name in self.cleaned_data['tags_input'].split(',') if name.strip()]
\ No newline at end of file
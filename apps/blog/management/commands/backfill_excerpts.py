@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Compute excerpt, word count and reading time for existing posts in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Recompute every post, not only those without an excerpt.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Post.objects.order_by('pk').only('pk', 'content')
+        if not options['all']:
+            queryset = queryset.filter(excerpt='')
+
+        last_pk = 0
+        total = 0
+        while True:
+            # Keyset over pk so each batch is an index range scan
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            for post in batch:
+                post.update_summary()
+            Post.objects.bulk_update(batch, ['excerpt', 'word_count', 'reading_time'])
+            last_pk = batch[-1].pk
+            total += len(batch)
+            self.stdout.write(f'Updated {total} posts...')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {total} posts.'))
@@ -0,0 +1,67 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from advanced_blog.images import forget_manifest, generate_renditions, manifest_name
+from apps.accounts.models import User
+from apps.blog.cache import invalidate_posts
+from apps.blog.models import Post
+
+
+def render(name):
+    """Runs in a worker process; returns ``(name, error)``."""
+    try:
+        generate_renditions(name)
+    except Exception as exc:
+        return name, f'{exc.__class__.__name__}: {exc}'
+    return name, None
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate resized renditions for existing post featured images and '
+        'profile pictures, in parallel worker processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--force', action='store_true', help='Regenerate images that already have renditions.')
+
+    def handle(self, *args, **options):
+        posts = {
+            name: pk for pk, name in
+            Post.objects.exclude(featured_image='').exclude(featured_image=None).values_list('pk', 'featured_image')
+        }
+        pictures = User.objects.exclude(profile_picture='').exclude(profile_picture=None)
+        names = set(posts) | set(pictures.values_list('profile_picture', flat=True))
+        if not options['force']:
+            names = {name for name in names if not default_storage.exists(manifest_name(name))}
+        names = {name for name in names if default_storage.exists(name)}
+        if not names:
+            self.stdout.write('Nothing to do.')
+            return
+
+        # Forked workers must not share this process's database sockets
+        connections.close_all()
+        done, failed = [], 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            futures = [pool.submit(render, name) for name in sorted(names)]
+            for future in as_completed(futures):
+                name, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                done.append(name)
+                forget_manifest(name)
+                self.stdout.write(f'Processed {len(done)}/{len(names)} images...')
+
+        updated_posts = Post.objects.filter(pk__in=[posts[name] for name in done if name in posts])
+        if updated_posts:
+            invalidate_posts(list(updated_posts))
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(f'Generated renditions for {len(done)} images, {failed} failed.'))
@@ -0,0 +1,176 @@
+"""Pre-render the public blog pages to HTML files.
+
+Renders, as an anonymous visitor would see them, every published post and
+the first page of the home, category and tag listings into a directory
+tree mirroring the URLs::
+
+    index.html
+    post/<slug>/index.html
+    category/<slug>/index.html
+    tag/<slug>/index.html
+
+Any file server can answer query-less GETs from it and pass everything else
+(later listing pages, search, signed-in users) to Django; with nginx, for
+example, ``try_files $uri/index.html @django`` when ``$args`` is empty.
+
+Builds are incremental: ``.export-state.json`` remembers each exported
+post's slug, ``updated_at`` and approved comment count.  Only posts whose
+values changed are re-rendered, deleted and unpublished posts are removed,
+and the listings (which all show the sidebar counts) are re-rendered when
+anything changed.  Renaming a category or tag rebuilds everything, as does
+``--full``.
+"""
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.blog.models import Category, Post, Tag
+
+STATE_FILE = '.export-state.json'
+# Must be in ALLOWED_HOSTS
+HOST = 'localhost'
+
+
+def page_file(output, url):
+    return Path(output, url.strip('/'), 'index.html')
+
+
+def render(output, urls):
+    """Runs in a worker process; returns ``[(url, error)]``."""
+    client = Client(HTTP_HOST=HOST)
+    results = []
+    for url in urls:
+        try:
+            response = client.get(url)
+            if response.status_code != 200:
+                raise ValueError(f'status {response.status_code}')
+            target = page_file(output, url)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # Replace atomically so the file server never sees half a page
+            partial = target.with_name('.index.html.tmp')
+            partial.write_bytes(response.content)
+            os.replace(partial, target)
+        except Exception as exc:
+            results.append((url, f'{exc.__class__.__name__}: {exc}'))
+        else:
+            results.append((url, None))
+    return results
+
+
+def taxonomy_fingerprint():
+    names = [
+        *Category.objects.order_by('pk').values_list('slug', 'name'),
+        *Tag.objects.order_by('pk').values_list('slug', 'name'),
+    ]
+    return hashlib.md5(json.dumps(names).encode()).hexdigest()
+
+
+class Command(BaseCommand):
+    help = (
+        'Render published posts and the first page of every listing to static '
+        'HTML files, re-rendering only what changed since the last export.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=str(settings.STATIC_EXPORT_ROOT),
+            help='Directory to write to (default: STATIC_EXPORT_ROOT).',
+        )
+        parser.add_argument('--full', action='store_true', help='Re-render every page.')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Rendering processes; 0 renders in this process.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=50, help='Pages per worker task.')
+
+    def handle(self, *args, **options):
+        output = Path(options['output'])
+        state_path = output / STATE_FILE
+        state = {}
+        if state_path.exists() and not options['full']:
+            state = json.loads(state_path.read_text())
+
+        posts = {
+            str(pk): [slug, updated_at.isoformat(), comments]
+            for pk, slug, updated_at, comments in Post.objects.published().values_list(
+                'pk', 'slug', 'updated_at', 'approved_comment_count',
+            )
+        }
+        listings = [
+            reverse('blog:home'),
+            *(reverse('blog:category_posts', args=[slug]) for slug in Category.objects.values_list('slug', flat=True)),
+            *(reverse('blog:tag_posts', args=[slug]) for slug in Tag.objects.values_list('slug', flat=True)),
+        ]
+        fingerprint = taxonomy_fingerprint()
+
+        old_posts = state.get('posts', {})
+        if state.get('taxonomy') != fingerprint:
+            changed = set(posts)
+        else:
+            changed = {pk for pk, values in posts.items() if old_posts.get(pk) != values}
+        # Gone, unpublished or renamed
+        stale = {old_posts[pk][0] for pk in old_posts if pk not in posts or posts[pk][0] != old_posts[pk][0]}
+        stale_listings = set(state.get('listings', [])) - set(listings)
+        if not (changed or stale or stale_listings):
+            self.stdout.write('Nothing changed since the last export.')
+            return
+
+        for slug in stale:
+            shutil.rmtree(output / 'post' / slug, ignore_errors=True)
+        for url in stale_listings:
+            page_file(output, url).unlink(missing_ok=True)
+
+        urls = listings + [reverse('blog:post_detail', args=[posts[pk][0]]) for pk in sorted(changed, key=int)]
+        failed = self.render_all(output, urls, options)
+
+        # Failed posts are left out of the state so the next run retries them
+        failed_slugs = {url.strip('/').split('/')[-1] for url in failed if url.startswith('/post/')}
+        output.mkdir(parents=True, exist_ok=True)
+        state_path.write_text(json.dumps({
+            'built_at': timezone.now().isoformat(),
+            'taxonomy': fingerprint if not failed else None,
+            'posts': {pk: values for pk, values in posts.items() if values[0] not in failed_slugs},
+            'listings': listings,
+        }, indent=1))
+
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Rendered {len(urls) - len(failed)} pages ({len(changed)} posts), '
+            f'removed {len(stale) + len(stale_listings)}, {len(failed)} failed.'
+        ))
+
+    def render_all(self, output, urls, options):
+        chunks = [urls[i:i + options['chunk_size']] for i in range(0, len(urls), options['chunk_size'])]
+        if not options['workers']:
+            results = (render(str(output), chunk) for chunk in chunks)
+            return self.collect(results, len(urls))
+        # Forked workers must not share this process's database sockets
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            futures = [pool.submit(render, str(output), chunk) for chunk in chunks]
+            return self.collect((future.result() for future in as_completed(futures)), len(urls))
+
+    def collect(self, results, total):
+        """Report progress per finished chunk; returns the URLs that failed."""
+        failed = []
+        done = 0
+        for chunk in results:
+            for url, error in chunk:
+                if error:
+                    failed.append(url)
+                    self.stderr.write(f'{url}: {error}')
+                else:
+                    done += 1
+            self.stdout.write(f'Rendered {done}/{total} pages...')
+        return failed
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.blog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from published posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic():
+            total = backend.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {total} posts with {backend.__class__.__name__}.'
+        ))
@@ -0,0 +1,226 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.accounts.models import User, UserActivity
+from apps.accounts.retention import rollup_activity
+from apps.accounts.roles import ROLE_FLAGS, get_role_group
+from apps.blog.models import Category, Comment, Post, Tag
+
+PREFIX = 'seed-'
+PASSWORD = 'seed-pass-123'
+
+WORDS = (
+    'django python query index cache template render database server async '
+    'worker request response queue latency throughput profile deploy static '
+    'media image search ranking postgres sqlite middleware session cookie '
+    'signal model view form admin migration test benchmark thread process '
+    'memory network proxy container build release monitor metric trace'
+).split()
+CATEGORIES = ['Backend', 'Frontend', 'Databases', 'DevOps', 'Performance', 'Security', 'Tutorials', 'News']
+
+
+def sentence(rng, low=6, high=18):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(low, high))]
+    return ' '.join(words).capitalize() + '.'
+
+
+def paragraph(rng):
+    parts = []
+    for _ in range(rng.randint(2, 6)):
+        text = sentence(rng)
+        roll = rng.random()
+        if roll < 0.15:
+            word = rng.choice(WORDS)
+            text = text.replace(word, f'<strong>{word}</strong>', 1)
+        elif roll < 0.25:
+            word = rng.choice(WORDS)
+            text = text.replace(word, f'<a href="https://example.com/{word}">{word}</a>', 1)
+        parts.append(text)
+    return '<p>' + ' '.join(parts) + '</p>'
+
+
+def article_html(rng):
+    """Body shaped like CKEditor output: headings, paragraphs, lists, quotes, code."""
+    blocks = [paragraph(rng)]
+    for _ in range(rng.randint(2, 6)):
+        blocks.append(f'<h2>{sentence(rng, 2, 5)[:-1]}</h2>')
+        blocks.extend(paragraph(rng) for _ in range(rng.randint(1, 4)))
+        roll = rng.random()
+        if roll < 0.3:
+            items = ''.join(f'<li>{sentence(rng, 3, 8)}</li>' for _ in range(rng.randint(3, 6)))
+            blocks.append(f'<ul>{items}</ul>')
+        elif roll < 0.45:
+            blocks.append(f'<blockquote><p>{sentence(rng)}</p></blockquote>')
+        elif roll < 0.6:
+            blocks.append(f'<pre><code>{rng.choice(WORDS)} = {rng.choice(WORDS)}({rng.choice(WORDS)})</code></pre>')
+    return '\n'.join(blocks)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a reproducible synthetic dataset (users by role, posts with '
+        'CKEditor-style HTML, categories, tags, comments, activity) for '
+        'benchmarks. Seeded rows are prefixed with "seed-" and --clear '
+        'removes only those.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--tags', type=int, default=40)
+        parser.add_argument('--comments', type=int, default=5, help='Average comments per post.')
+        parser.add_argument('--activity', type=int, default=5000, help='UserActivity rows.')
+        parser.add_argument('--days', type=int, default=365, help='Spread timestamps over this many days.')
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Random seed; reseeding with the same value needs --clear.',
+        )
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded rows first.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        span = timedelta(days=options['days'])
+
+        def moment():
+            return now - span * rng.random()
+
+        if options['clear']:
+            self.clear()
+
+        with transaction.atomic():
+            users = self.seed_users(options['users'])
+            authors = [user for user in users if user.role in ('admin', 'author')]
+            categories = [
+                Category.objects.get_or_create(slug=f'{PREFIX}{name.lower()}', defaults={'name': name})[0]
+                for name in CATEGORIES
+            ]
+            tags = [
+                Tag.objects.get_or_create(slug=f'{PREFIX}tag-{i}', defaults={'name': f'{rng.choice(WORDS)} {i}'})[0]
+                for i in range(options['tags'])
+            ]
+
+            posts = Post.objects.bulk_import([
+                Post(
+                    title=sentence(rng, 3, 9)[:-1][:200],
+                    slug=f'{PREFIX}post-{options["seed"]}-{i}',
+                    content=article_html(rng),
+                    author=rng.choice(authors),
+                    # A few categories get most posts, like a real blog
+                    category=categories[min(int(rng.expovariate(0.5)), len(categories) - 1)],
+                    status='published' if rng.random() < 0.9 else 'draft',
+                )
+                for i in range(options['posts'])
+            ])
+            # auto_now_add/auto_now ignore explicit values, so spread the
+            # timestamps afterwards
+            for post in posts:
+                post.created_at = moment()
+                post.updated_at = post.created_at
+            Post.objects.bulk_update(posts, ['created_at', 'updated_at'], batch_size=500)
+
+            # Tag popularity follows a long tail
+            weights = [1 / (rank + 1) for rank in range(len(tags))]
+            PostTag = Post.tags.through
+            links = set()
+            for post in posts:
+                for tag in rng.choices(tags, weights, k=rng.randint(1, 5)):
+                    links.add((post.pk, tag.pk))
+            PostTag.objects.bulk_create(
+                [PostTag(post_id=post_id, tag_id=tag_id) for post_id, tag_id in links],
+                batch_size=1000, ignore_conflicts=True,
+            )
+
+            comments = [
+                Comment(
+                    post=post, user=rng.choice(users), content=sentence(rng),
+                    is_approved=rng.random() < 0.8,
+                )
+                for post in posts
+                for _ in range(int(rng.expovariate(1 / options['comments'])) if options['comments'] else 0)
+            ]
+            Comment.objects.bulk_create(comments, batch_size=1000)
+            for comment in comments:
+                comment.created_at = max(comment.post.created_at, moment())
+                comment.set_tree_position()
+            # A third of the visible comments get replies, a few levels deep
+            parents = [comment for comment in comments if comment.is_approved]
+            for depth in range(1, 4):
+                parents = rng.sample(parents, len(parents) // 3)
+                replies = [
+                    Comment(
+                        post=parent.post, user=rng.choice(users), content=sentence(rng),
+                        is_approved=rng.random() < 0.9, parent=parent, depth=depth,
+                    )
+                    for parent in parents
+                    for _ in range(rng.randint(1, 4))
+                ]
+                Comment.objects.bulk_create(replies, batch_size=1000)
+                for reply in replies:
+                    reply.created_at = max(reply.parent.created_at, moment())
+                    reply.set_tree_position()
+                comments.extend(replies)
+                parents = [reply for reply in replies if reply.is_approved]
+            Comment.objects.bulk_update(comments, ['created_at', 'thread', 'path'], batch_size=1000)
+            # bulk_create skips Comment.save(), which maintains the counts
+            Post.objects.filter(slug__startswith=PREFIX).refresh_comment_counts()
+
+            slugs = [post.slug for post in posts if post.status == 'published']
+            paths = ['/', *(f'/post/{slug}/' for slug in slugs[:200]), '/search/', '/accounts/dashboard/']
+            activity = UserActivity.objects.bulk_create(
+                [
+                    UserActivity(
+                        user=rng.choice(users), activity_type='page_visit',
+                        details={'path': rng.choice(paths), 'method': 'GET'},
+                    )
+                    for _ in range(options['activity'])
+                ],
+                batch_size=1000,
+            )
+            activity_span = min(span, timedelta(days=30))
+            for row in activity:
+                row.timestamp = now - activity_span * rng.random()
+            UserActivity.objects.bulk_update(activity, ['timestamp'], batch_size=1000)
+
+        rollup_activity(start=timezone.localtime(now - activity_span).date())
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(users)} users, {len(posts)} posts, {len(tags)} tags, '
+            f'{len(comments)} comments and {len(activity)} activity rows. '
+            f'Seeded users log in with password {PASSWORD!r}.'
+        ))
+
+    def seed_users(self, count):
+        password = make_password(PASSWORD)
+        users = []
+        for i in range(count):
+            # Roughly 5% admins, 25% authors, the rest readers; always at
+            # least one admin and one author
+            role = 'admin' if i % 20 == 0 else 'author' if i % 4 == 1 else 'reader'
+            is_staff, is_superuser = ROLE_FLAGS[role]
+            users.append(User(
+                username=f'{PREFIX}{role}-{i}', email=f'{PREFIX}{i}@example.com',
+                password=password, role=role, is_staff=is_staff, is_superuser=is_superuser,
+            ))
+        existing = set(User.objects.filter(username__startswith=PREFIX).values_list('username', flat=True))
+        # bulk_create skips the post_save role sync, so add the role groups here
+        created = User.objects.bulk_create([user for user in users if user.username not in existing])
+        Membership = User.groups.through
+        Membership.objects.bulk_create(
+            [Membership(user_id=user.pk, group_id=get_role_group(user.role).pk) for user in created],
+            ignore_conflicts=True,
+        )
+        # A stable order keeps rng.choice(users) reproducible
+        return list(User.objects.filter(username__in=[user.username for user in users]).order_by('username'))
+
+    def clear(self):
+        with transaction.atomic():
+            Post.objects.filter(slug__startswith=PREFIX).delete()
+            Category.objects.filter(slug__startswith=PREFIX).delete()
+            Tag.objects.filter(slug__startswith=PREFIX).delete()
+            User.objects.filter(username__startswith=PREFIX).delete()
+        self.stdout.write('Removed previously seeded data.')
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+from apps.blog.utils import html_to_text
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE blog_post_fts USING fts5(title, body, tokenize='porter unicode61')"
+        )
+        insert = 'INSERT INTO blog_post_fts (rowid, title, body) VALUES (%s, %s, %s)'
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE TABLE blog_post_fts ('
+            'post_id bigint PRIMARY KEY REFERENCES blog_post (id) ON DELETE CASCADE, '
+            'body text NOT NULL, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute('CREATE INDEX blog_post_fts_document_gin ON blog_post_fts USING GIN (document)')
+        insert = (
+            'INSERT INTO blog_post_fts (post_id, body, document) VALUES (%s, %s, '
+            "setweight(to_tsvector('english', %s), 'A') || setweight(to_tsvector('english', %s), 'B'))"
+        )
+    else:
+        return
+
+    Post = apps.get_model('blog', 'Post')
+    posts = Post.objects.filter(status='published').only('pk', 'title', 'content').iterator(chunk_size=500)
+    with schema_editor.connection.cursor() as cursor:
+        for post in posts:
+            body = html_to_text(post.content)
+            if vendor == 'sqlite':
+                cursor.execute(insert, [post.pk, post.title, body])
+            else:
+                cursor.execute(insert, [post.pk, body, post.title, body])
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE IF EXISTS blog_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_post_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='blog_post_status_created_idx'),
+        ),
+    ]
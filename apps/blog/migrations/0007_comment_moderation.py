@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_approved_comments(apps, schema_editor):
+    Comment = apps.get_model('blog', 'Comment')
+    Post = apps.get_model('blog', 'Post')
+    approved = (
+        Comment.objects.filter(post=OuterRef('pk'), is_approved=True)
+        .order_by().values('post').annotate(total=Count('pk')).values('total')
+    )
+    Post.objects.update(approved_comment_count=Coalesce(Subquery(approved), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_responsive_images'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='approved_comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('is_approved', False)), fields=['created_at', 'id'], name='blog_comment_pending_idx'),
+        ),
+        migrations.RunPython(count_approved_comments, migrations.RunPython.noop),
+    ]
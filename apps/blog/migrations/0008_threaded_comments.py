@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Cast, LPad
+
+
+def make_existing_comments_threads(apps, schema_editor):
+    # Every existing comment becomes the root of its own thread
+    Comment = apps.get_model('blog', 'Comment')
+    Comment.objects.update(thread=F('pk'), path=LPad(Cast('pk', CharField()), 10, Value('0')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_comment_moderation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='blog.comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=60),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='thread',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.comment'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['thread', 'path'], name='blog_comment_thread_idx'),
+        ),
+        migrations.RunPython(make_existing_comments_threads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_threaded_comments'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', 'updated_at'], name='blog_post_status_updated_idx'),
+        ),
+    ]
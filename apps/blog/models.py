@@ -1,7 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.text import slugify
 from ckeditor.fields import RichTextField
+from advanced_blog.images import ResponsiveImageField
+from .utils import summarize
 
 User = get_user_model()
 
@@ -21,11 +26,42 @@ class Category(models.Model):
     class Meta:
         verbose_name_plural = 'Categories'
 
+class TagQuerySet(models.QuerySet):
+    def resolve(self, names):
+        """Return the tags for ``names`` in order, creating missing ones.
+
+        Names are matched by slug, so "Django" and "django" are one tag.
+        Costs one SELECT when every tag exists; otherwise a ``bulk_create``
+        that ignores slug conflicts (another request may be creating the
+        same tag) and one re-read of the new slugs.  ``post_save`` is not
+        sent; pages change only once the tags are attached to a post.
+        """
+        slug_length = self.model._meta.get_field('slug').max_length
+        name_length = self.model._meta.get_field('name').max_length
+        wanted = {}
+        for name in names:
+            name = name.strip()[:name_length]
+            slug = slugify(name)[:slug_length]
+            if slug and slug not in wanted:
+                wanted[slug] = name
+        if not wanted:
+            return []
+        with transaction.atomic():
+            tags = {tag.slug: tag for tag in self.filter(slug__in=wanted)}
+            missing = [self.model(name=name, slug=slug) for slug, name in wanted.items() if slug not in tags]
+            if missing:
+                self.bulk_create(missing, ignore_conflicts=True)
+                tags.update((tag.slug, tag) for tag in self.filter(slug__in=[tag.slug for tag in missing]))
+        return [tags[slug] for slug in wanted]
+
+
 class Tag(models.Model):
     name = models.CharField(max_length=50)
     slug = models.SlugField(unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = TagQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
@@ -34,6 +70,74 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+class PostQuerySet(models.QuerySet):
+    def published(self):
+        return self.filter(status='published')
+
+    def for_listing(self):
+        """Everything a post card needs, in a constant number of queries.
+
+        The full ``content`` body is deferred; cards render the stored
+        ``excerpt`` instead.
+        """
+        return (
+            self.select_related('author', 'category')
+            .prefetch_related('tags')
+            .defer('content')
+        )
+
+    def publish(self):
+        """Publish every draft in the queryset with a single UPDATE.
+
+        No per-row ``post_save`` is sent; ``post_published`` fires once for
+        the whole batch instead.  Returns the number of posts published.
+        """
+        from .signals import post_published
+
+        with transaction.atomic():
+            posts = list(self.exclude(status='published').select_for_update())
+            if not posts:
+                return 0
+            now = timezone.now()
+            self.model.objects.filter(pk__in=[post.pk for post in posts]).update(
+                status='published', updated_at=now,
+            )
+            for post in posts:
+                post.status, post.updated_at = 'published', now
+            post_published.send(sender=self.model, posts=posts, bulk=True)
+        return len(posts)
+
+    def refresh_comment_counts(self):
+        """Recompute ``approved_comment_count`` for the queryset in one UPDATE."""
+        approved = (
+            Comment.objects.filter(post=OuterRef('pk'), is_approved=True)
+            .order_by().values('post').annotate(total=Count('pk')).values('total')
+        )
+        return self.update(approved_comment_count=Coalesce(Subquery(approved), 0))
+
+    def bulk_import(self, posts, batch_size=500):
+        """``bulk_create`` for scripted imports.
+
+        Fills in what ``Post.save()`` would (slug, excerpt) and sends a single
+        ``post_published`` for the published rows.
+        """
+        from .signals import post_published
+
+        for post in posts:
+            post.prepare_for_save()
+        with transaction.atomic():
+            created = self.bulk_create(posts, batch_size=batch_size)
+            published = [post for post in created if post.status == 'published']
+            if published:
+                post_published.send(sender=self.model, posts=published, bulk=True)
+        return created
+
+
+class PublishedPostManager(models.Manager.from_queryset(PostQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().published()
+
+
 class Post(models.Model):
     STATUS_CHOICES = (
         ('draft', 'Draft'),
@@ -43,7 +147,14 @@ class Post(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     content = RichTextField()
-    featured_image = models.ImageField(upload_to='posts/%Y/%m/%d/', blank=True, null=True)
+    # Derived from content on save; see apps.blog.utils.summarize
+    excerpt = models.TextField(blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=1, editable=False)
+    # Kept in step by Comment.save() and CommentQuerySet; shown on listings
+    approved_comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Resized renditions are generated on upload (advanced_blog.images)
+    featured_image = ResponsiveImageField(upload_to='posts/%Y/%m/%d/', blank=True, null=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blog_posts')
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='posts')
     tags = models.ManyToManyField(Tag, related_name='posts')
@@ -51,26 +162,190 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def save(self, *args, **kwargs):
+    objects = PostQuerySet.as_manager()
+    published = PublishedPostManager()
+
+    # Values remembered from the database row so save() can report changes
+    # (exposed to signal receivers as _old_status / _old_category_id)
+    TRACKED_FIELDS = ('status', 'category_id')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in cls.TRACKED_FIELDS
+        }
+        return instance
+
+    def update_summary(self):
+        self.excerpt, self.word_count, self.reading_time = summarize(self.content)
+
+    def prepare_for_save(self):
         if not self.slug:
             self.slug = slugify(self.title)
+        self.update_summary()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.prepare_for_save()
+        elif 'content' in update_fields:
+            self.update_summary()
+            kwargs['update_fields'] = set(update_fields) | {'excerpt', 'word_count', 'reading_time'}
+        loaded = getattr(self, '_loaded_values', {})
+        self._old_status = loaded.get('status')
+        self._old_category_id = loaded.get('category_id')
         super().save(*args, **kwargs)
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            name: getattr(self, name) for name in self.TRACKED_FIELDS if name not in deferred
+        }
 
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Listing order and keyset pagination seek (apps.blog.pagination)
+            models.Index(fields=['status', 'created_at', 'id'], name='blog_post_status_created_idx'),
+            # Listing Last-Modified: MAX(updated_at) of published posts
+            models.Index(fields=['status', 'updated_at'], name='blog_post_status_updated_idx'),
+            # Category listings
+            models.Index(fields=['category', 'status', 'created_at'], name='blog_post_cat_status_idx'),
+            # Profile/dashboard "my posts"
+            models.Index(fields=['author', 'created_at'], name='blog_post_author_created_idx'),
+            # Admin and dashboard "all posts", newest first
+            models.Index(fields=['created_at'], name='blog_post_created_idx'),
+        ]
+
+class CommentQuerySet(models.QuerySet):
+    def pending(self):
+        return self.filter(is_approved=False)
+
+    def approve(self):
+        """Approve every pending comment in the queryset with a single UPDATE.
+
+        Refreshes the affected posts' ``approved_comment_count`` in the same
+        transaction and sends ``comments_moderated`` once.  Returns the
+        number of comments approved.
+        """
+        from .signals import comments_moderated
+
+        with transaction.atomic():
+            rows = list(self.pending().select_for_update().order_by().values_list('pk', 'post_id'))
+            if not rows:
+                return 0
+            self.model.objects.filter(pk__in=[pk for pk, _ in rows]).update(is_approved=True)
+            post_ids = {post_id for _, post_id in rows}
+            Post.objects.filter(pk__in=post_ids).refresh_comment_counts()
+            comments_moderated.send(sender=self.model, post_ids=post_ids)
+        return len(rows)
+
+    def remove(self):
+        """Delete the queryset with a single DELETE, keeping post counts in step.
+
+        Returns the number of comments selected; replies deleted with them
+        are not counted.
+        """
+        from .signals import comments_moderated
+
+        with transaction.atomic():
+            rows = list(self.select_for_update().order_by().values_list('pk', 'post_id', 'is_approved'))
+            if not rows:
+                return 0
+            self.model.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+            # Only approved comments are counted
+            recount = {post_id for _, post_id, approved in rows if approved}
+            if recount:
+                Post.objects.filter(pk__in=recount).refresh_comment_counts()
+            comments_moderated.send(sender=self.model, post_ids={post_id for _, post_id, _ in rows})
+        return len(rows)
+
 
 class Comment(models.Model):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
+    """A comment, or a reply to one.
+
+    Threads are stored as a materialized path: ``path`` is the zero-padded
+    ids of the root, each ancestor and the comment itself, so ordering by
+    it yields a thread depth-first, oldest reply first.  ``thread`` points
+    at the root, letting the replies of many threads load in one query (see
+    apps.blog.threads).
+    """
+    # Digits per path segment, and the deepest reply; replies to a comment
+    # at MAX_DEPTH become its siblings
+    PATH_STEP = 10
+    MAX_DEPTH = 5
+
+    # Indexed through blog_comment_post_approved_idx (post is its leading column)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments', db_index=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
+    parent = models.ForeignKey(
+        'self', on_delete=models.CASCADE, related_name='replies', null=True, blank=True,
+    )
+    # Indexed through blog_comment_thread_idx
+    thread = models.ForeignKey(
+        'self', on_delete=models.CASCADE, related_name='+', null=True, editable=False, db_index=False,
+    )
+    path = models.CharField(max_length=(MAX_DEPTH + 1) * PATH_STEP, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     is_approved = models.BooleanField(default=False)
 
+    objects = CommentQuerySet.as_manager()
+
+    @classmethod
+    def path_segment(cls, pk):
+        return str(pk).zfill(cls.PATH_STEP)
+
+    def set_tree_position(self):
+        """Fill in ``thread`` and ``path`` once the comment has a pk."""
+        if self.parent_id:
+            self.thread_id = self.parent.thread_id
+            self.path = self.parent.path + self.path_segment(self.pk)
+        else:
+            self.thread_id = self.pk
+            self.path = self.path_segment(self.pk)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'is_approved' in field_names:
+            instance._loaded_approved = values[field_names.index('is_approved')]
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Exposed to signal receivers, which refresh the post's count when
+        # the approval changes
+        self._old_is_approved = getattr(self, '_loaded_approved', None)
+        if not self._state.adding or self.path:
+            super().save(*args, **kwargs)
+        else:
+            if self.parent_id and self.parent.depth >= self.MAX_DEPTH:
+                self.parent = self.parent.parent
+            self.depth = self.parent.depth + 1 if self.parent_id else 0
+            # The path needs the new pk, so it is written straight after the
+            # insert, in the same transaction
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                self.set_tree_position()
+                Comment.objects.filter(pk=self.pk).update(thread=self.thread_id, path=self.path)
+        self._loaded_approved = self.is_approved
+
     def __str__(self):
         return f'Comment by {self.user.username} on {self.post.title}'
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Approved comments of a post, newest first
+            models.Index(fields=['post', 'is_approved', 'created_at'], name='blog_comment_post_approved_idx'),
+            # Replies of a page of threads, in thread order
+            models.Index(fields=['thread', 'path'], name='blog_comment_thread_idx'),
+            # The moderation queue: pending comments, newest first
+            models.Index(
+                fields=['created_at', 'id'], condition=Q(is_approved=False), name='blog_comment_pending_idx',
+            ),
+        ]
@@ -0,0 +1,142 @@
+"""Keyset (cursor) pagination for post listings.
+
+Offset pagination costs a ``COUNT(*)`` per request and an ``OFFSET n`` scan
+that grows with the page number.  Keyset pagination instead seeks to the
+last row seen, ordered by ``(created_at, id)`` and backed by the
+``(status, created_at, id)`` index, so every page costs the same.
+
+Cursors are opaque, URL-safe tokens; there are no page numbers or totals.
+Enable with ``BLOG_KEYSET_PAGINATION = True`` in settings.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+
+
+def encode_cursor(post, direction):
+    raw = json.dumps([post.created_at.isoformat(), post.pk, direction])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk, direction = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return datetime.fromisoformat(created_at), int(pk), direction
+    except (ValueError, TypeError):
+        raise Http404('Invalid cursor')
+
+
+class KeysetPage:
+    is_keyset = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """Newest-first pages of a queryset (posts, comments), seeking on ``(created_at, id)``."""
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def get_page_queryset(self, cursor=None):
+        """Return ``(queryset, direction)`` fetching up to ``per_page + 1`` rows."""
+        if not cursor:
+            return self.queryset.order_by('-created_at', '-pk')[:self.per_page + 1], None
+        created_at, pk, direction = decode_cursor(cursor)
+        # The leading created_at bound is what lets the index seek; the OR
+        # alone would force a scan
+        if direction == 'next':
+            older = Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(pk__lt=pk))
+            return self.queryset.filter(older).order_by('-created_at', '-pk')[:self.per_page + 1], direction
+        newer = Q(created_at__gte=created_at) & (Q(created_at__gt=created_at) | Q(pk__gt=pk))
+        return self.queryset.filter(newer).order_by('created_at', 'pk')[:self.per_page + 1], direction
+
+    def page(self, cursor=None):
+        queryset, direction = self.get_page_queryset(cursor)
+        return self.build_page(list(queryset), direction)
+
+    async def apage(self, cursor=None):
+        queryset, direction = self.get_page_queryset(cursor)
+        return self.build_page([row async for row in queryset], direction)
+
+    def build_page(self, rows, direction):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'prev':
+            rows.reverse()
+        if not rows:
+            return KeysetPage(rows)
+        if direction is None:
+            return KeysetPage(rows, encode_cursor(rows[-1], 'next') if has_more else None)
+        if direction == 'next':
+            return KeysetPage(
+                rows,
+                next_cursor=encode_cursor(rows[-1], 'next') if has_more else None,
+                previous_cursor=encode_cursor(rows[0], 'prev'),
+            )
+        return KeysetPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1], 'next'),
+            previous_cursor=encode_cursor(rows[0], 'prev') if has_more else None,
+        )
+
+
+class KeysetPaginationMixin:
+    """Use KeysetPaginator in a ListView when keyset pagination is enabled."""
+    keyset_pagination = None
+
+    def use_keyset_pagination(self):
+        if self.keyset_pagination is not None:
+            return self.keyset_pagination
+        return getattr(settings, 'BLOG_KEYSET_PAGINATION', False)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size)
+        page = paginator.page(self.request.GET.get('cursor'))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """``paginate_queryset()`` fetching the page through the async ORM."""
+        if self.use_keyset_pagination():
+            paginator = KeysetPaginator(queryset, page_size)
+            page = await paginator.apage(self.request.GET.get('cursor'))
+            return paginator, page, page.object_list, page.has_other_pages()
+        paginator = self.get_paginator(queryset, page_size, allow_empty_first_page=self.get_allow_empty())
+        # With the count known, picking the page runs no query
+        paginator.count = await queryset.acount()
+        number = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            page = paginator.page(paginator.num_pages if number == 'last' else number)
+        except InvalidPage as exc:
+            raise Http404(f'Invalid page ({number}): {exc}')
+        page.object_list = [row async for row in page.object_list]
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,198 @@
+"""Full-text search backends for published posts.
+
+The backend is chosen from the database vendor:
+
+* SQLite: an FTS5 virtual table ``blog_post_fts`` ranked with bm25().
+* PostgreSQL: a ``blog_post_fts`` table holding a weighted tsvector with a
+  GIN index, ranked with ts_rank() and highlighted with ts_headline().
+* Anything else falls back to the old ``icontains`` scan.
+
+The index holds plain text (HTML stripped) for published posts only and is
+kept in sync from the Post signals in ``apps.blog.signals``.  Run the
+``rebuild_search_index`` command after bulk updates that bypass signals.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .utils import html_to_text
+
+# Snippet highlight markers; replaced with <mark> after escaping, see the
+# ``highlight`` template filter.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+MAX_RESULTS = 500
+
+_token_re = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return _token_re.findall(query or '')
+
+
+class BaseSearchBackend:
+    def search(self, query, limit=MAX_RESULTS):
+        """Return published post ids matching ``query``, best match first."""
+        raise NotImplementedError
+
+    def snippets(self, query, post_ids):
+        """Return ``{post_id: snippet}`` with matches wrapped in markers."""
+        return {}
+
+    def index(self, post):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def rebuild(self, batch_size=500):
+        from .models import Post
+
+        self.clear()
+        total = 0
+        last_pk = 0
+        queryset = Post.published.order_by('pk').only('pk', 'title', 'content')
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            self.index_many(batch)
+            last_pk = batch[-1].pk
+            total += len(batch)
+        return total
+
+    def index_many(self, posts):
+        for post in posts:
+            self.index(post)
+
+    def clear(self):
+        pass
+
+
+class IcontainsSearchBackend(BaseSearchBackend):
+    """Unindexed substring match; used where no full-text engine exists."""
+
+    def search(self, query, limit=MAX_RESULTS):
+        from .models import Post
+
+        return list(
+            Post.published.filter(Q(title__icontains=query) | Q(content__icontains=query))
+            .values_list('pk', flat=True)[:limit]
+        )
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    table = 'blog_post_fts'
+
+    def match_expression(self, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        # Quote every token so user input can't inject FTS5 syntax; the last
+        # token is a prefix match to support search-as-you-type.
+        terms = ['"%s"' % token for token in tokens]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, query, limit=MAX_RESULTS):
+        match = self.match_expression(query)
+        if match is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s '
+                f'ORDER BY bm25({self.table}, 10.0, 1.0) LIMIT %s',
+                [match, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def snippets(self, query, post_ids):
+        match = self.match_expression(query)
+        if match is None or not post_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(post_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, snippet({self.table}, 1, %s, %s, '…', 24) FROM {self.table} "
+                f'WHERE {self.table} MATCH %s AND rowid IN ({placeholders})',
+                [MARK_START, MARK_END, match, *post_ids],
+            )
+            return dict(cursor.fetchall())
+
+    def index(self, post):
+        self.index_many([post])
+
+    def index_many(self, posts):
+        rows = [(post.pk, post.title, html_to_text(post.content)) for post in posts]
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(f'INSERT INTO {self.table} (rowid, title, body) VALUES (%s, %s, %s)', rows)
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    table = 'blog_post_fts'
+    config = 'english'
+
+    def search(self, query, limit=MAX_RESULTS):
+        if not tokenize(query):
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id FROM {self.table}, websearch_to_tsquery(%s::regconfig, %s) query '
+                f'WHERE document @@ query ORDER BY ts_rank(document, query) DESC LIMIT %s',
+                [self.config, query, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def snippets(self, query, post_ids):
+        if not tokenize(query) or not post_ids:
+            return {}
+        options = f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=30, MinWords=15'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT post_id, ts_headline(%s::regconfig, body, websearch_to_tsquery(%s::regconfig, %s), %s) '
+                f'FROM {self.table} WHERE post_id = ANY(%s)',
+                [self.config, self.config, query, options, list(post_ids)],
+            )
+            return dict(cursor.fetchall())
+
+    def index(self, post):
+        self.index_many([post])
+
+    def index_many(self, posts):
+        rows = [(post.pk, post.title, html_to_text(post.content)) for post in posts]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (post_id, body, document) VALUES (%s, %s, '
+                f"setweight(to_tsvector(%s::regconfig, %s), 'A') || setweight(to_tsvector(%s::regconfig, %s), 'B')) "
+                f'ON CONFLICT (post_id) DO UPDATE SET body = EXCLUDED.body, document = EXCLUDED.document',
+                [(pk, body, self.config, title, self.config, body) for pk, title, body in rows],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE post_id = %s', [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    return BACKENDS.get(connection.vendor, IcontainsSearchBackend)()
@@ -0,0 +1,44 @@
+"""Cached sidebar data shared by every listing template.
+
+Both lists are computed with a single aggregate query each and cached
+under the ``sidebar`` scope, which is bumped whenever a post, category or
+tag changes (see ``apps.blog.signals``).  Values expire with the page
+cache, so entries left behind by an old version do not pile up.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .cache import get_timeout, get_versions
+from .models import Category, Tag
+
+POPULAR_TAG_LIMIT = 20
+
+published_posts = Count('posts', filter=Q(posts__status='published'))
+
+
+def _cached(name, compute):
+    key = f'blog:sidebar:{name}:{get_versions(["sidebar"])[0]}'
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, get_timeout())
+    return value
+
+
+def get_categories():
+    """All categories with their published post counts, by name."""
+    return _cached('categories', lambda: list(
+        Category.objects.annotate(post_count=published_posts)
+        .order_by('name')
+        .values('name', 'slug', 'post_count')
+    ))
+
+
+def get_popular_tags(limit=POPULAR_TAG_LIMIT):
+    """The ``limit`` tags with the most published posts."""
+    return _cached(f'tags:{limit}', lambda: list(
+        Tag.objects.annotate(post_count=published_posts)
+        .filter(post_count__gt=0)
+        .order_by('-post_count', 'name')
+        .values('name', 'slug', 'post_count')[:limit]
+    ))
@@ -1,42 +1,146 @@
-from django.db.models.signals import pre_save, post_save
-from django.dispatch import receiver
-from .models import Post
-
-@receiver(pre_save, sender=Post)
-def store_old_status(sender, instance, **kwargs):
-    """Store the old status so post_save can detect status changes."""
-    if instance.pk:
-        try:
-            old = Post.objects.get(pk=instance.pk)
-            instance._old_status = old.status
-        except Post.DoesNotExist:
-            instance._old_status = None
-    else:
-        instance._old_status = None
+from django.conf import settings
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import Signal, receiver
+from advanced_blog.images import renditions_ready
+from .models import Category, Comment, Post, Tag
+from .search import get_search_backend
+from .slugs import slug_cache
+from . import cache
+
+# Sent once per publish transition, with ``posts`` as a list.  Single saves
+# send it from post_save; PostQuerySet.publish() and bulk_import() send one
+# event for a whole batch with ``bulk=True``.
+post_published = Signal()
+
+# Sent by CommentQuerySet.approve() and remove() once per batch, with the
+# ``post_ids`` whose comments changed.
+comments_moderated = Signal()
 
 
 @receiver(post_save, sender=Post)
-def notify_on_publish(sender, instance, created, **kwargs):
-    """Create a lightweight activity/notification when a post is published."""
+def dispatch_publish_event(sender, instance, created, update_fields=None, **kwargs):
+    """Detect draft -> published transitions from the in-memory old status."""
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    if instance.status == 'published' and getattr(instance, '_old_status', None) != 'published':
+        post_published.send(sender=Post, posts=[instance], bulk=False)
+
+
+@receiver(post_published)
+def record_publish_activity(sender, posts, **kwargs):
+    """Create a lightweight activity/notification when posts are published."""
     # Import here to avoid circular imports
-    try:
-        from apps.accounts.models import UserActivity
-    except Exception:
-        UserActivity = None
+    from apps.accounts.models import UserActivity
 
-    became_published = False
-    if instance.status == 'published':
-        if created:
-            became_published = True
-        else:
-            old = getattr(instance, '_old_status', None)
-            if old != 'published':
-                became_published = True
-
-    if became_published and UserActivity is not None:
-        # Record activity for the author
-        UserActivity.objects.create(
-            user=instance.author,
+    UserActivity.objects.bulk_create([
+        UserActivity(
+            user_id=post.author_id,
             activity_type='post_published',
-            details={'post_id': instance.id, 'title': instance.title}
+            details={'post_id': post.id, 'title': post.title},
         )
+        for post in posts
+    ])
+
+
+@receiver(post_published)
+def sync_bulk_published(sender, posts, bulk, **kwargs):
+    """Bulk paths skip post_save, so index and invalidate here instead."""
+    if not bulk:
+        return
+    get_search_backend().index_many(posts)
+    cache.invalidate_posts(posts)
+
+
+@receiver(post_save, sender=Post)
+def update_search_index(sender, instance, **kwargs):
+    """Keep the full-text index in step with published posts."""
+    backend = get_search_backend()
+    if instance.status == 'published':
+        backend.index(instance)
+    else:
+        backend.remove(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def remove_from_search_index(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_pages(sender, instance, created, **kwargs):
+    extra = []
+    old_category_id = getattr(instance, '_old_category_id', None)
+    if old_category_id and old_category_id != instance.category_id:
+        extra = [f'category:{slug}' for slug in Category.objects.filter(pk=old_category_id).values_list('slug', flat=True)]
+    # A brand-new post has no tags yet; m2m_changed covers adding them
+    cache.invalidate_post(instance, extra, with_tags=not created)
+
+
+@receiver(pre_delete, sender=Post)
+def invalidate_deleted_post_pages(sender, instance, **kwargs):
+    # pre_delete: the post's tag rows are still there to be looked up
+    cache.invalidate_post(instance)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_post_tag_pages(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if action == 'pre_clear':
+        slugs = instance.tags.values_list('slug', flat=True)
+    else:
+        slugs = Tag.objects.filter(pk__in=pk_set).values_list('slug', flat=True)
+    cache.invalidate('posts', 'sidebar', f'post:{instance.slug}', *(f'tag:{slug}' for slug in slugs))
+
+
+@receiver(post_save, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    # Deletions go through CommentQuerySet.remove(); a post_delete receiver
+    # would also run once per comment on cascades.
+    if instance.is_approved != bool(getattr(instance, '_old_is_approved', None)):
+        Post.objects.filter(pk=instance.post_id).refresh_comment_counts()
+        # Listings show the approved count too
+        cache.invalidate_post(instance.post)
+    else:
+        cache.invalidate(f'post:{instance.post.slug}')
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def collect_commented_posts(sender, instance, **kwargs):
+    # Deleting a user cascades to their comments (and the replies to them)
+    # without going through CommentQuerySet.remove(); note which posts'
+    # counts change so they are recounted once, after the cascade
+    instance._commented_post_ids = set(
+        Comment.objects.filter(user=instance, is_approved=True).values_list('post_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def recount_commented_posts(sender, instance, **kwargs):
+    post_ids = getattr(instance, '_commented_post_ids', None)
+    if post_ids:
+        posts = Post.objects.filter(pk__in=post_ids)
+        posts.refresh_comment_counts()
+        cache.invalidate_posts(posts.only('pk', 'slug'))
+
+
+@receiver(comments_moderated)
+def invalidate_moderated_pages(sender, post_ids, **kwargs):
+    cache.invalidate_posts(Post.objects.filter(pk__in=post_ids).only('pk', 'slug'))
+
+
+@receiver(renditions_ready, sender=Post)
+def invalidate_rendition_pages(sender, pk, **kwargs):
+    # Cached pages still point at the original image until re-rendered
+    post = Post.objects.select_related('category').filter(pk=pk).first()
+    if post is not None:
+        cache.invalidate_post(post)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_taxonomy(sender, **kwargs):
+    cache.invalidate('taxonomy', 'sidebar')
+    slug_cache.evict_model(sender)
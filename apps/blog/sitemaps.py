@@ -0,0 +1,97 @@
+"""XML sitemaps for crawlers.
+
+``sitemap.xml`` is an index of ``sitemap-pages.xml`` (the home page and
+every category and tag listing) and of ``sitemap-posts-<n>.xml`` chunks of
+at most ``CHUNK_SIZE`` published posts, the per-file limit of the sitemap
+protocol.  Chunks are streamed from an ``.iterator()`` over ``(slug,
+updated_at)`` rows, so memory stays flat however large the archive; chunk
+``n`` is an OFFSET into the posts by primary key.
+
+Sitemaps are cached and validated under the ``posts`` scope plus
+``taxonomy`` (which every cached page carries, see ``CachedPageMixin``), so
+publishing a post and adding, renaming or removing a category or tag all
+refresh them.  The page cache keeps a streamed chunk once it has been sent
+in full (a full chunk is about 5 MB, more than memcached accepts by
+default).
+"""
+import math
+from xml.sax.saxutils import escape
+
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.views.generic import View
+
+from .cache import CachedPageMixin
+from .models import Category, Post, Tag
+from .views import ListingConditionalGetMixin
+
+CHUNK_SIZE = 50_000
+# Entries joined into each streamed block
+BLOCK_SIZE = 500
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+class SitemapView(CachedPageMixin, ListingConditionalGetMixin, View):
+    """Streams ``(path, lastmod)`` entries from ``get_entries()`` as XML."""
+    root = 'urlset'
+    element = 'url'
+    # CachedPageMixin adds ``taxonomy``, which the listings sitemap depends on
+    cache_scopes = ('posts',)
+
+    def get_entries(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        return StreamingHttpResponse(
+            self.render(self.get_entries(), escape(request.build_absolute_uri('/')[:-1])),
+            content_type='application/xml; charset=utf-8',
+        )
+
+    def render(self, entries, base):
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n<{self.root} xmlns="{XMLNS}">\n'
+        block = []
+        for path, lastmod in entries:
+            lastmod = f'<lastmod>{lastmod.isoformat(timespec="seconds")}</lastmod>' if lastmod else ''
+            block.append(f'<{self.element}><loc>{base}{escape(path)}</loc>{lastmod}</{self.element}>\n')
+            if len(block) == BLOCK_SIZE:
+                yield ''.join(block)
+                block = []
+        yield ''.join(block) + f'</{self.root}>\n'
+
+
+class SitemapIndexView(SitemapView):
+    root = 'sitemapindex'
+    element = 'sitemap'
+
+    def get_entries(self):
+        yield reverse('blog:sitemap_pages'), None
+        for number in range(1, max(1, math.ceil(Post.published.count() / CHUNK_SIZE)) + 1):
+            yield reverse('blog:sitemap_posts', args=[number]), None
+
+
+class ListingSitemapView(SitemapView):
+    def get_entries(self):
+        yield reverse('blog:home'), None
+        for slug in Category.objects.order_by('pk').values_list('slug', flat=True).iterator():
+            yield reverse('blog:category_posts', args=[slug]), None
+        for slug in Tag.objects.order_by('pk').values_list('slug', flat=True).iterator():
+            yield reverse('blog:tag_posts', args=[slug]), None
+
+
+class PostSitemapView(SitemapView):
+    def get(self, request, number):
+        if number < 1:
+            raise Http404('No such sitemap chunk.')
+        self.rows = Post.published.order_by('pk').values_list('slug', 'updated_at')[
+            (number - 1) * CHUNK_SIZE:number * CHUNK_SIZE
+        ]
+        # The first chunk exists even before anything is published
+        if number > 1 and not self.rows.exists():
+            raise Http404('No such sitemap chunk.')
+        return super().get(request, number)
+
+    def get_entries(self):
+        # Slugs are URL-safe, so one reverse() serves every row
+        path = reverse('blog:post_detail', args=['SLUG']).replace('SLUG', '%s')
+        for slug, updated_at in self.rows.iterator(chunk_size=2000):
+            yield path % slug, updated_at
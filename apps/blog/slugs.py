@@ -0,0 +1,110 @@
+"""In-process slug lookups for categories and tags.
+
+Category and tag listings resolve their slug on every request.  Both
+tables are small and rarely change, so resolved objects are kept in a
+bounded LRU for ``BLOG_SLUG_CACHE_TTL`` seconds (default 60, 0 disables
+it).  Each entry remembers the page cache's ``taxonomy`` scope version it
+was read under and is only used while that version is current, so a
+category or tag saved or deleted in any server process is seen by all of
+them on their next lookup, and a listing never renders stale taxonomy into
+a page cached under the new version.  Saves in this process also empty
+that model's entries straight away (apps.blog.signals).
+
+Callers get their own copy of the cached instance, so it is safe to
+modify.  Unknown slugs are not cached.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import Http404
+
+from .cache import aget_versions, get_versions
+
+MAX_ENTRIES = 512
+
+
+def get_ttl():
+    return getattr(settings, 'BLOG_SLUG_CACHE_TTL', 60)
+
+
+class SlugCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model, slug):
+        """The ``model`` instance with ``slug``; raises Http404 if there is none."""
+        key, now = (model._meta.label, slug), time.monotonic()
+        # Read before the row, so a concurrent change leaves the entry stale
+        [version] = get_versions(['taxonomy'])
+        instance = self.lookup(key, now, version)
+        if instance is None:
+            instance = self.store(key, now, version, model._default_manager.filter(slug=slug).first(), model)
+        return copy.copy(instance)
+
+    async def aget(self, model, slug):
+        key, now = (model._meta.label, slug), time.monotonic()
+        [version] = await aget_versions(['taxonomy'])
+        instance = self.lookup(key, now, version)
+        if instance is None:
+            instance = self.store(key, now, version, await model._default_manager.filter(slug=slug).afirst(), model)
+        return copy.copy(instance)
+
+    def lookup(self, key, now, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now and entry[1] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        return None
+
+    def store(self, key, now, version, instance, model):
+        if instance is None:
+            raise Http404(f'No {model._meta.verbose_name} matches the given query.')
+        ttl = get_ttl()
+        if ttl:
+            with self._lock:
+                self._entries[key] = (now + ttl, version, instance)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return instance
+
+    def evict_model(self, model):
+        label = model._meta.label
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == label]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+slug_cache = SlugCache()
+
+
+def resolve_slug(model, slug):
+    return slug_cache.get(model, slug)
+
+
+async def aresolve_slug(model, slug):
+    return await slug_cache.aget(model, slug)
@@ -0,0 +1,57 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.forms.utils import flatatt
+from django.utils.html import escape, format_html
+from django.utils.safestring import mark_safe
+
+from advanced_blog.images import get_manifest
+from apps.blog import sidebar
+from apps.blog.search import MARK_END, MARK_START
+
+register = template.Library()
+
+
+@register.filter
+def highlight(snippet):
+    """Render a search snippet: escape the text, then turn markers into <mark>."""
+    html = escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    return mark_safe(html)
+
+
+@register.inclusion_tag('blog/includes/sidebar.html')
+def blog_sidebar(tag_limit=sidebar.POPULAR_TAG_LIMIT):
+    return {
+        'categories': sidebar.get_categories(),
+        'tags': sidebar.get_popular_tags(tag_limit),
+    }
+
+
+def _srcset(manifest, fmt):
+    return ', '.join(
+        f'{default_storage.url(entry[fmt])} {entry["width"]}w' for entry in manifest.values()
+    )
+
+
+@register.simple_tag
+def responsive_image(image, size='card', sizes='100vw', **attrs):
+    """Render an uploaded image as a <picture> with WebP and JPEG srcsets.
+
+    ``size`` picks the fallback rendition (thumb, card or hero); ``sizes``
+    tells the browser how wide the slot is.  Extra keyword arguments become
+    <img> attributes.  Until renditions exist the original is used.
+    """
+    if not image:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    manifest = get_manifest(image.name)
+    if not manifest:
+        return format_html('<img src="{}"{}>', image.url, flatatt(attrs))
+    # Small originals have no larger renditions; fall back to the biggest one
+    fallback = manifest.get(size) or list(manifest.values())[-1]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        _srcset(manifest, 'webp'), sizes,
+        default_storage.url(fallback['jpeg']), _srcset(manifest, 'jpeg'), sizes, flatatt(attrs),
+    )
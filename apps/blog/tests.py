@@ -1,3 +1,976 @@
-from django.test import TestCase
+import importlib
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.admin.sites import site
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import Http404
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, reverse
+from PIL import Image
+
+from advanced_blog import urls as project_urls
+from advanced_blog.images import get_manifest
+from advanced_blog.metrics import QueryRecorder, request_metrics
+from apps.accounts.models import User, UserActivity
+from .admin import CommentAdmin
+from .cache import invalidate, page_cache_stats
+from .checks import check_ckeditor_contents_css, check_shared_page_cache
+from .models import Category, Comment, Post, Tag
+from .slugs import slug_cache
+from . import sidebar, threads, urls as blog_urls
+
+
+class ListingQueryCountTests(TestCase):
+    """Listing pages must cost the same number of queries at any page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('writer', password='pass12345', role='author')
+        cls.category = Category.objects.create(name='Django')
+        cls.tags = [Tag.objects.create(name=f'tag {i}') for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        slug_cache.clear()
+
+    def make_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                title=f'Listing post {Post.objects.count()}',
+                content='<p>Some searchable body text</p>' * 20,
+                author=self.author,
+                category=self.category,
+                status='published',
+            )
+            post.tags.set(self.tags)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, url, expected):
+        self.make_posts(2)
+        small = self.count_queries(url)
+        self.make_posts(8)
+        large = self.count_queries(url)
+        self.assertEqual(small, large)
+        self.assertEqual(large, expected)
+
+    # Counts include the two sidebar queries: the sidebar cache is cold
+    # because creating posts invalidates it.  Listings also run the one
+    # ETag/Last-Modified aggregate when the page isn't cached yet.
+    def test_home(self):
+        self.assertConstantQueries(reverse('blog:home'), 6)
+
+    # The first visit resolves the slug; afterwards it comes from the
+    # in-process slug cache and costs no query
+    def test_category(self):
+        url = reverse('blog:category_posts', args=[self.category.slug])
+        self.client.get(url)
+        self.assertConstantQueries(url, 6)
+
+    def test_tag(self):
+        url = reverse('blog:tag_posts', args=[self.tags[0].slug])
+        self.client.get(url)
+        self.assertConstantQueries(url, 6)
+
+    def test_search(self):
+        self.assertConstantQueries(reverse('blog:search') + '?q=searchable', 6)
+
+    def test_listing_defers_content(self):
+        self.make_posts(1)
+        post = Post.published.for_listing().get()
+        self.assertIn('content', post.get_deferred_fields())
+        self.assertTrue(post.excerpt.startswith('Some searchable body text'))
+
+
+class PostSummaryTests(TestCase):
+    def test_summary_computed_on_save(self):
+        author = User.objects.create_user('summary', password='pass12345', role='author')
+        post = Post.objects.create(
+            title='Summary',
+            content='<p>Hello &amp; <b>welcome</b></p>' + '<p>word</p>' * 400,
+            author=author,
+            category=Category.objects.create(name='Misc'),
+        )
+        self.assertTrue(post.excerpt.startswith('Hello & welcome word'))
+        self.assertNotIn('<', post.excerpt)
+        self.assertEqual(post.word_count, 403)
+        self.assertEqual(post.reading_time, 3)
+
+        post.content = '<p>short</p>'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'short')
+        self.assertEqual(post.reading_time, 1)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('searcher', password='pass12345', role='author')
+        category = Category.objects.create(name='Search')
+        cls.in_title = Post.objects.create(
+            title='Django performance', content='<p>Tuning notes</p>',
+            author=author, category=category, status='published',
+        )
+        cls.in_body = Post.objects.create(
+            title='Notes', content='<p>Profiling a <b>django</b> app &lt;script&gt;</p>',
+            author=author, category=category, status='published',
+        )
+        cls.draft = Post.objects.create(
+            title='Django draft', content='<p>django</p>',
+            author=author, category=category, status='draft',
+        )
+
+    def search(self, query):
+        return self.client.get(reverse('blog:search'), {'q': query})
+
+    def test_ranked_results_exclude_drafts(self):
+        response = self.search('django')
+        self.assertEqual(list(response.context['posts']), [self.in_title, self.in_body])
+
+    def test_capped_results_say_so(self):
+        self.assertNotContains(self.search('django'), 'best matches only')
+        with patch('apps.blog.views.MAX_RESULTS', 1):
+            response = self.search('django')
+        self.assertEqual(list(response.context['posts']), [self.in_title])
+        self.assertContains(response, 'Showing the 1 best matches only.')
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        response = self.search('profiling')
+        self.assertContains(response, '<mark>Profiling</mark> a django app &lt;script&gt;')
+
+    def test_index_follows_status_and_delete(self):
+        self.in_body.status = 'draft'
+        self.in_body.save()
+        self.assertEqual(list(self.search('profiling').context['posts']), [])
+        self.draft.status = 'published'
+        self.draft.save()
+        self.assertIn(self.draft, self.search('draft').context['posts'])
+        self.draft.delete()
+        self.assertEqual(list(self.search('draft').context['posts']), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('"django" OR (').status_code, 200)
+
+
+class SidebarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('sider', password='pass12345', role='author')
+        cls.category = Category.objects.create(name='Sidebar')
+        cls.busy, cls.quiet, cls.unused = (Tag.objects.create(name=n) for n in ('busy', 'quiet', 'unused'))
+        for i in range(3):
+            post = Post.objects.create(
+                title=f'Side {i}', content='<p>x</p>', author=author,
+                category=cls.category, status='published' if i < 2 else 'draft',
+            )
+            post.tags.add(cls.busy, *([cls.quiet] if i == 0 else []))
+        cls.author = author
+
+    def setUp(self):
+        cache.clear()
+
+    def test_popular_tags_ordered_by_published_count(self):
+        tags = sidebar.get_popular_tags()
+        self.assertEqual([(t['slug'], t['post_count']) for t in tags], [('busy', 2), ('quiet', 1)])
+        self.assertEqual(sidebar.get_popular_tags(limit=1)[0]['slug'], 'busy')
+
+    def test_cached_until_posts_change(self):
+        self.assertEqual(sidebar.get_categories()[0]['post_count'], 2)
+        sidebar.get_popular_tags()
+        with self.assertNumQueries(0):
+            sidebar.get_categories()
+            sidebar.get_popular_tags()
+        Post.objects.create(
+            title='Side new', content='<p>x</p>', author=self.author,
+            category=self.category, status='published',
+        )
+        self.assertEqual(sidebar.get_categories()[0]['post_count'], 3)
+
+    @override_settings(BLOG_PAGE_CACHE_TIMEOUT=120)
+    def test_values_expire_with_the_page_cache(self):
+        with patch.object(sidebar.cache, 'set', wraps=cache.set) as cache_set:
+            sidebar.get_categories()
+        self.assertEqual(cache_set.call_args.args[2], 120)
+
+
+class PageCacheTests(TestCase):
+    """Cached public pages must never outlive the content they show."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('cacher', password='pass12345', role='author')
+        cls.reader = User.objects.create_user('reader', password='pass12345')
+        cls.category = Category.objects.create(name='Cached')
+        cls.tag = Tag.objects.create(name='cached-tag')
+        cls.post = Post.objects.create(
+            title='First post', content='<p>original body</p>',
+            author=cls.author, category=cls.category, status='published',
+        )
+        cls.post.tags.add(cls.tag)
+
+    def setUp(self):
+        cache.clear()
+        page_cache_stats.reset()
+
+    def test_repeat_anonymous_views_are_served_from_cache(self):
+        url = reverse('blog:home')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'First post')
+        self.assertEqual(page_cache_stats.stats()['hits'], 1)
+
+    def test_publish_shows_up_on_every_listing(self):
+        urls = [
+            reverse('blog:home'),
+            reverse('blog:category_posts', args=[self.category.slug]),
+            reverse('blog:tag_posts', args=[self.tag.slug]),
+        ]
+        for url in urls:
+            self.client.get(url)
+        draft = Post.objects.create(
+            title='Fresh news', content='<p>new</p>',
+            author=self.author, category=self.category, status='draft',
+        )
+        draft.tags.add(self.tag)
+        for url in urls:
+            self.assertNotContains(self.client.get(url), 'Fresh news')
+        draft.status = 'published'
+        draft.save()
+        for url in urls:
+            self.assertContains(self.client.get(url), 'Fresh news')
+
+    def test_edit_and_category_move_invalidate(self):
+        detail = reverse('blog:post_detail', args=[self.post.slug])
+        old_category = reverse('blog:category_posts', args=[self.category.slug])
+        self.client.get(detail)
+        self.client.get(old_category)
+        other = Category.objects.create(name='Elsewhere')
+        self.post.content = '<p>edited body</p>'
+        self.post.category = other
+        self.post.save()
+        self.assertContains(self.client.get(detail), 'edited body')
+        self.assertNotContains(self.client.get(old_category), 'First post')
+
+    def test_comment_approval_invalidates_detail(self):
+        detail = reverse('blog:post_detail', args=[self.post.slug])
+        first = Comment.objects.create(post=self.post, user=self.reader, content='via view')
+        second = Comment.objects.create(post=self.post, user=self.reader, content='via admin')
+        self.assertNotContains(self.client.get(detail), 'via view')
+
+        self.client.force_login(self.author)
+        self.client.post(reverse('blog:comment_approve', args=[first.pk]))
+        self.client.logout()
+        self.assertContains(self.client.get(detail), 'via view')
+        self.assertNotContains(self.client.get(detail), 'via admin')
+
+        request = RequestFactory().post('/admin/')
+        CommentAdmin(Comment, site).approve_comments(request, Comment.objects.filter(pk=second.pk))
+        self.assertContains(self.client.get(detail), 'via admin')
+
+    def test_conditional_get_returns_304_until_content_changes(self):
+        detail = reverse('blog:post_detail', args=[self.post.slug])
+        response = self.client.get(detail)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        # Served from the page cache with the same validators
+        self.assertEqual(self.client.get(detail)['ETag'], etag)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(detail, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        comment = Comment.objects.create(post=self.post, user=self.reader, content='hi', is_approved=True)
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        comment.delete()
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_listing_etag_changes_when_a_post_is_deleted(self):
+        home = reverse('blog:home')
+        other = Post.objects.create(
+            title='Second post', content='<p>x</p>', author=self.author,
+            category=self.category, status='published',
+        )
+        etag = self.client.get(home)['ETag']
+        self.assertEqual(self.client.get(home, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        other.delete()
+        self.assertEqual(self.client.get(home, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_signed_in_pages_are_not_cached(self):
+        self.client.force_login(self.reader)
+        self.client.get(reverse('blog:home'))
+        self.client.get(reverse('blog:home'))
+        self.assertEqual(page_cache_stats.stats()['hits'], 0)
+
+
+class PostSaveQueryTests(TestCase):
+    """Post.save() must not re-read the row or write activity twice."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('saver', password='pass12345', role='author')
+        cls.category = Category.objects.create(name='Saves')
+
+    def new_post(self, **kwargs):
+        kwargs.setdefault('title', 'Saved')
+        return Post(content='<p>body</p>', author=self.author, category=self.category, **kwargs)
+
+    def publish_activity(self):
+        return UserActivity.objects.filter(activity_type='post_published')
+
+    def test_create_draft(self):
+        # INSERT post + remove from search index
+        with self.assertNumQueries(2):
+            self.new_post().save()
+
+    def test_publish_loaded_post(self):
+        post = self.new_post()
+        post.save()
+        post = Post.objects.get(pk=post.pk)
+        post.status = 'published'
+        # UPDATE post, activity INSERT, index (delete + insert), then the
+        # category and tag slugs for cache invalidation; no SELECT of the post
+        with self.assertNumQueries(6):
+            post.save()
+        self.assertEqual(self.publish_activity().count(), 1)
+
+    def test_resaving_published_post_records_nothing(self):
+        post = self.new_post(status='published')
+        post.save()
+        post.title = 'Renamed'
+        post.save()
+        Post.objects.get(pk=post.pk).save()
+        self.assertEqual(self.publish_activity().count(), 1)
+
+    def test_bulk_import_and_publish(self):
+        posts = [self.new_post(title=f'Imported {i}', status='published' if i % 2 else 'draft') for i in range(10)]
+        # Savepoint pair, one INSERT, one activity INSERT, batched index
+        # writes and two slug lookups, independent of the number of posts
+        with self.assertNumQueries(8):
+            created = Post.objects.bulk_import(posts)
+        self.assertTrue(all(post.excerpt == 'body' and post.slug for post in created))
+        self.assertEqual(self.publish_activity().count(), 5)
+
+        self.assertEqual(Post.objects.filter(status='draft').publish(), 5)
+        self.assertEqual(Post.published.count(), 10)
+        self.assertEqual(self.publish_activity().count(), 10)
+        self.assertEqual(self.client.get(reverse('blog:search'), {'q': 'imported'}).context['paginator'].count, 10)
+
+
+@override_settings(BLOG_KEYSET_PAGINATION=True)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('pager', password='pass12345', role='author')
+        category = Category.objects.create(name='Pages')
+        Post.objects.bulk_import([
+            Post(title=f'Page post {i:02d}', content='<p>x</p>', author=author,
+                 category=category, status='published')
+            for i in range(25)
+        ])
+        # Identical timestamps force the id tie-breaker to do its job
+        Post.objects.update(created_at=Post.objects.first().created_at)
+        cls.expected = list(Post.objects.order_by('-created_at', '-pk').values_list('title', flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def titles(self, response):
+        return [post.title for post in response.context['posts']]
+
+    def test_walk_forward_and_back(self):
+        url = reverse('blog:home')
+        first = self.client.get(url)
+        page = first.context['page_obj']
+        self.assertEqual(self.titles(first), self.expected[:10])
+        self.assertFalse(page.has_previous())
+
+        second = self.client.get(url, {'cursor': page.next_cursor})
+        third = self.client.get(url, {'cursor': second.context['page_obj'].next_cursor})
+        self.assertEqual(self.titles(second), self.expected[10:20])
+        self.assertEqual(self.titles(third), self.expected[20:])
+        self.assertFalse(third.context['page_obj'].has_next())
+
+        back = self.client.get(url, {'cursor': third.context['page_obj'].previous_cursor})
+        self.assertEqual(self.titles(back), self.expected[10:20])
+        self.assertContains(back, 'Older')
+
+    def test_no_count_query(self):
+        # Signed in, so the page is rendered and validated on every request
+        self.client.force_login(User.objects.first())
+        # The sidebar's per-category counts are cached across requests
+        sidebar.get_categories()
+        sidebar.get_popular_tags()
+        for path in (reverse('blog:home'), reverse('blog:feed'), reverse('blog:sitemap_pages')):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(path)
+                if response.streaming:
+                    b''.join(response)
+            self.assertTrue(response.has_header('ETag'))
+            self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries), path)
+
+    def test_bad_cursor_is_404(self):
+        self.assertEqual(self.client.get(reverse('blog:home'), {'cursor': 'garbage'}).status_code, 404)
+
+
+@override_settings(IMAGE_RENDITIONS={'ASYNC': False})
+class ResponsiveImageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.author = User.objects.create_user('photographer', password='pass12345', role='author')
+        self.category = Category.objects.create(name='Photos')
+
+    def upload(self, width, height):
+        buffer = BytesIO()
+        Image.new('RGBA', (width, height), (200, 30, 30, 128)).save(buffer, 'PNG')
+        return SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+
+    def test_upload_generates_renditions_and_srcset(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                title='Sunset', content='<p>Orange</p>', author=self.author,
+                category=self.category, status='published', featured_image=self.upload(1600, 900),
+            )
+        manifest = get_manifest(post.featured_image.name)
+        self.assertEqual({size: entry['width'] for size, entry in manifest.items()},
+                         {'thumb': 160, 'card': 640, 'hero': 1280})
+        self.assertTrue(manifest['card']['webp'].startswith('posts/'))
+        response = self.client.get(reverse('blog:home'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '.card.jpg 640w')
+        self.assertNotContains(response, f'src="{post.featured_image.url}"')
+
+    def test_small_images_are_not_upscaled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                title='Icon', content='<p>Tiny</p>', author=self.author,
+                category=self.category, featured_image=self.upload(100, 100),
+            )
+        manifest = get_manifest(post.featured_image.name)
+        self.assertEqual(list(manifest), ['thumb'])
+        self.assertEqual(manifest['thumb']['width'], 100)
+
+    def test_unchanged_image_is_not_reprocessed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                title='Still', content='<p>Still</p>', author=self.author,
+                category=self.category, featured_image=self.upload(300, 200),
+            )
+        with self.captureOnCommitCallbacks() as callbacks:
+            post.title = 'Still life'
+            post.save()
+        self.assertEqual(len(callbacks), 0)
+
+
+class StaticFilesCheckTests(TestCase):
+    def run_check(self, contents_css):
+        with override_settings(CKEDITOR_CONFIGS={'default': {'contentsCss': contents_css}}):
+            return [error.id for error in check_ckeditor_contents_css(None)]
+
+    def test_configured_contents_css_resolves(self):
+        self.assertEqual(check_ckeditor_contents_css(None), [])
+
+    def test_missing_and_hardcoded_paths_are_reported(self):
+        self.assertEqual(self.run_check(['/static/css/missing.css']), ['blog.E001'])
+        self.assertEqual(self.run_check(['/static/css/editor_contents.css']), ['blog.W001'])
+        self.assertEqual(self.run_check(['https://cdn.example.com/editor.css']), [])
+
+    def test_per_process_cache_with_several_workers_is_reported(self):
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}
+        with patch.dict('os.environ', {'WEB_CONCURRENCY': '4'}):
+            self.assertEqual([error.id for error in check_shared_page_cache(None)], ['blog.E002'])
+            with override_settings(CACHES=shared):
+                self.assertEqual(check_shared_page_cache(None), [])
+        with patch.dict('os.environ', {'WEB_CONCURRENCY': '1'}):
+            self.assertEqual(check_shared_page_cache(None), [])
+
+
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('metrics-admin', password='pass12345', role='admin')
+        cls.author = User.objects.create_user('metrics-author', password='pass12345', role='author')
+        category = Category.objects.create(name='Measured')
+        for i in range(3):
+            Post.objects.create(
+                title=f'Measured {i}', content='<p>body</p>', author=cls.author,
+                category=category, status='published',
+            )
+
+    def setUp(self):
+        cache.clear()
+        request_metrics.reset()
+
+    @override_settings(REQUEST_METRICS={'SERVER_TIMING': True})
+    def test_requests_are_timed_per_route(self):
+        response = self.client.get(reverse('blog:home'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=')
+        route = request_metrics.stats()['routes']['GET blog:home']
+        self.assertEqual(route['requests'], 1)
+        self.assertGreater(route['avg_queries'], 0)
+        self.assertEqual(route['avg_bytes'], len(response.content))
+        self.assertEqual(route['statuses'], {'2xx': 1})
+
+    @override_settings(REQUEST_METRICS={})
+    def test_server_timing_is_opt_in(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('blog:home')))
+        self.assertEqual(request_metrics.stats()['routes']['GET blog:home']['requests'], 1)
+
+    @override_settings(REQUEST_METRICS={'SLOW_QUERY_COUNT': 0})
+    def test_requests_over_the_thresholds_are_logged(self):
+        with self.assertLogs('advanced_blog.metrics', 'WARNING') as logs:
+            self.client.get(reverse('blog:home'))
+        self.assertIn('Slow request GET /', logs.output[0])
+        self.assertEqual(request_metrics.stats()['slow_requests'], 1)
+
+    def test_recorder_reports_repeated_statements(self):
+        recorder = QueryRecorder()
+        with recorder.record():
+            # The classic N+1: one query per post
+            for post in Post.objects.all():
+                post.tags.count()
+        self.assertEqual(recorder.count, 4)
+        [(count, sql)] = recorder.duplicates(threshold=2)
+        self.assertEqual(count, 3)
+        self.assertIn('blog_post_tags', sql)
+
+    def test_metrics_endpoint_is_admin_only(self):
+        url = reverse('request_metrics')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.admin)
+        data = self.client.get(url).json()
+        self.assertIn('GET request_metrics', data['routes'])
+        self.assertIn('hit_ratio', data['page_cache'])
+
+
+class CommentModerationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('moderator', password='pass12345', role='author')
+        cls.other = User.objects.create_user('bystander', password='pass12345', role='author')
+        cls.reader = User.objects.create_user('commenter', password='pass12345')
+        category = Category.objects.create(name='Moderated')
+        cls.post = Post.objects.create(
+            title='Moderated post', content='<p>body</p>', author=cls.author,
+            category=category, status='published',
+        )
+        cls.other_post = Post.objects.create(
+            title='Somebody else', content='<p>body</p>', author=cls.other,
+            category=category, status='published',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def comment(self, post, text, approved=False):
+        return Comment.objects.create(post=post, user=self.reader, content=text, is_approved=approved)
+
+    def approved_count(self, post):
+        return Post.objects.values_list('approved_comment_count', flat=True).get(pk=post.pk)
+
+    def test_queue_bulk_approves_and_rejects_own_pending_comments(self):
+        mine = [self.comment(self.post, f'pending {i}') for i in range(3)]
+        theirs = self.comment(self.other_post, 'not yours')
+        url = reverse('blog:comment_moderation')
+        self.client.force_login(self.author)
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['comments']), 3)
+        self.assertNotContains(response, 'not yours')
+
+        self.client.post(url, {'action': 'approve', 'comments': [mine[0].pk, mine[1].pk, theirs.pk]})
+        self.assertEqual(self.approved_count(self.post), 2)
+        self.assertFalse(Comment.objects.get(pk=theirs.pk).is_approved)
+
+        self.client.post(url, {'action': 'reject', 'comments': [mine[2].pk, theirs.pk]})
+        self.assertFalse(Comment.objects.filter(pk=mine[2].pk).exists())
+        self.assertTrue(Comment.objects.filter(pk=theirs.pk).exists())
+        self.assertEqual(self.approved_count(self.post), 2)
+
+    def test_bulk_approve_is_one_update_plus_recount(self):
+        for i in range(5):
+            self.comment(self.post, f'pending {i}')
+        # Savepoint pair, select pending, UPDATE comments, UPDATE counts,
+        # then post, category and tag slugs for cache invalidation
+        with self.assertNumQueries(8):
+            self.assertEqual(Comment.objects.filter(post=self.post).approve(), 5)
+        self.assertEqual(self.approved_count(self.post), 5)
+
+    def test_count_follows_single_saves_and_deletes_and_shows_on_listings(self):
+        comment = self.comment(self.post, 'single')
+        self.assertEqual(self.approved_count(self.post), 0)
+        comment.is_approved = True
+        comment.save()
+        self.assertEqual(self.approved_count(self.post), 1)
+        self.assertContains(self.client.get(reverse('blog:home')), '1 comment')
+
+        self.comment(self.post, 'auto-approved', approved=True)
+        self.client.force_login(self.author)
+        self.client.post(reverse('blog:comment_delete', args=[comment.pk]))
+        self.assertEqual(self.approved_count(self.post), 1)
+        self.client.logout()
+        self.assertContains(self.client.get(reverse('blog:home')), '1 comment')
+
+    def test_remove_counts_selected_comments_not_cascaded_replies(self):
+        root = self.comment(self.post, 'root', approved=True)
+        Comment.objects.create(post=self.post, user=self.author, content='reply', parent=root, is_approved=True)
+        self.assertEqual(Comment.objects.filter(pk=root.pk).remove(), 1)
+        self.assertFalse(Comment.objects.filter(post=self.post).exists())
+        self.assertEqual(self.approved_count(self.post), 0)
+
+    def test_deleting_a_commenter_recounts_their_posts(self):
+        self.comment(self.post, 'approved', approved=True)
+        self.comment(self.other_post, 'approved too', approved=True)
+        self.comment(self.other_post, 'pending')
+        Comment.objects.create(post=self.post, user=self.author, content='kept', is_approved=True)
+        self.assertContains(self.client.get(reverse('blog:home')), '2 comments')
+        self.reader.delete()
+        self.assertEqual((self.approved_count(self.post), self.approved_count(self.other_post)), (1, 0))
+        self.assertContains(self.client.get(reverse('blog:home')), '1 comment')
+
+
+class ThreadedCommentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('threader', password='pass12345', role='author')
+        cls.post = Post.objects.create(
+            title='Threaded post', content='<p>body</p>', author=cls.author,
+            category=Category.objects.create(name='Threads'), status='published',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def comment(self, text, parent=None):
+        return Comment.objects.create(
+            post=self.post, user=self.author, content=text, parent=parent, is_approved=True,
+        )
+
+    def test_replies_get_a_materialized_path(self):
+        self.client.force_login(self.author)
+        root = self.comment('root')
+        self.client.post(reverse('blog:post_detail', args=[self.post.slug]), {'content': 'reply', 'parent': root.pk})
+        reply = Comment.objects.get(content='reply')
+        self.assertEqual((reply.thread_id, reply.depth, reply.path), (root.pk, 1, root.path + reply.path[-10:]))
+
+        # Past MAX_DEPTH, replies become siblings of the comment replied to
+        parent = reply
+        for depth in range(2, Comment.MAX_DEPTH + 2):
+            parent = self.comment(f'depth {depth}', parent)
+        self.assertEqual(parent.depth, Comment.MAX_DEPTH)
+        self.assertEqual(parent.parent.depth, Comment.MAX_DEPTH - 1)
+
+    def test_replies_to_unknown_parents_are_not_found(self):
+        self.client.force_login(self.author)
+        url = reverse('blog:post_detail', args=[self.post.slug])
+        for parent in ('abc', '1.5', '999999'):
+            self.assertEqual(self.client.post(url, {'content': 'reply', 'parent': parent}).status_code, 404)
+        self.assertFalse(Comment.objects.filter(content='reply').exists())
+
+    def test_threads_load_in_constant_queries_with_more_replies_on_demand(self):
+        def page_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse('blog:post_detail', args=[self.post.slug]))
+            return response, len(ctx.captured_queries)
+
+        root = self.comment('first thread')
+        self.comment('only reply', root)
+        _, few = page_queries()
+
+        cache.clear()
+        replies = [self.comment(f'reply {i}', root) for i in range(threads.REPLY_PREVIEW + 2)]
+        for i in range(3):
+            self.comment(f'nested {i}', self.comment(f'thread {i}'))
+        response, many = page_queries()
+        self.assertEqual(few, many)
+        [first_thread] = [thread for thread in response.context['threads'] if thread.pk == root.pk]
+        self.assertTrue(first_thread.more_replies)
+        self.assertEqual(len(first_thread.preview), threads.REPLY_PREVIEW)
+
+        more = self.client.get(
+            reverse('blog:comment_replies', args=[self.post.slug, root.pk]),
+            {'after': first_thread.preview[-1].path},
+        )
+        self.assertEqual(
+            [comment.content for comment in more.context['replies']],
+            [reply.content for reply in replies[threads.REPLY_PREVIEW - 1:]],
+        )
+        self.assertFalse(more.context['more_replies'])
+
+
+class TagResolutionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('tagger', password='pass12345', role='author')
+        cls.category = Category.objects.create(name='Tagged')
+        cls.django = Tag.objects.create(name='Django')
+
+    def test_resolve_matches_by_slug_and_bulk_creates_the_rest(self):
+        # Savepoint pair, existing slugs, bulk insert, re-read of new slugs
+        with self.assertNumQueries(5):
+            tags = Tag.objects.resolve(['django', 'Web Dev', ' web dev ', 'Caching', '', '!!!'])
+        self.assertEqual([tag.slug for tag in tags], ['django', 'web-dev', 'caching'])
+        self.assertEqual(tags[0], self.django)
+        self.assertTrue(all(tag.pk for tag in tags))
+        with self.assertNumQueries(3):
+            Tag.objects.resolve(['Django', 'caching'])
+
+    def test_create_and_update_views_save_tags(self):
+        self.client.force_login(self.author)
+        self.client.post(reverse('blog:post_create'), {
+            'title': 'Tagged post', 'content': '<p>body</p>', 'category': self.category.pk,
+            'status': 'published', 'tags_input': 'Django, Signals',
+        })
+        post = Post.objects.get(title='Tagged post')
+        self.assertEqual(sorted(post.tags.values_list('slug', flat=True)), ['django', 'signals'])
+
+        edit = reverse('blog:post_edit', args=[post.slug])
+        response = self.client.get(edit)
+        self.assertEqual(response.context['form'].fields['tags_input'].initial, 'Django, Signals')
+        self.client.post(edit, {
+            'title': 'Tagged post', 'content': '<p>body</p>', 'category': self.category.pk,
+            'status': 'published', 'tags_input': 'signals, ORM',
+        })
+        self.assertEqual(sorted(post.tags.values_list('slug', flat=True)), ['orm', 'signals'])
+
+
+class SlugCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Slugged')
+
+    def setUp(self):
+        slug_cache.clear()
+
+    def test_hits_are_copies_and_saves_evict(self):
+        with self.assertNumQueries(1):
+            first = slug_cache.get(Category, 'slugged')
+            first.name = 'Changed locally'
+            self.assertEqual(slug_cache.get(Category, 'slugged').name, 'Slugged')
+        self.category.name = 'Renamed'
+        self.category.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(slug_cache.get(Category, 'slugged').name, 'Renamed')
+        with self.assertRaises(Http404):
+            slug_cache.get(Category, 'missing')
+
+    def test_entries_follow_the_shared_taxonomy_version(self):
+        slug_cache.get(Category, 'slugged')
+        # As if another worker renamed it: no signal reaches this process,
+        # only the bumped version in the shared cache
+        Category.objects.filter(pk=self.category.pk).update(name='Renamed elsewhere')
+        invalidate('taxonomy')
+        with self.assertNumQueries(1):
+            self.assertEqual(slug_cache.get(Category, 'slugged').name, 'Renamed elsewhere')
+
+    @override_settings(BLOG_SLUG_CACHE_TTL=0)
+    def test_zero_ttl_disables_caching(self):
+        slug_cache.get(Category, 'slugged')
+        with self.assertNumQueries(1):
+            slug_cache.get(Category, 'slugged')
+
+    def test_post_views_fetch_their_post_once(self):
+        author = User.objects.create_user('once', password='pass12345', role='author')
+        post = Post.objects.create(
+            title='Fetched once', content='<p>body</p>', author=author, category=self.category,
+        )
+        self.client.force_login(author)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('blog:post_delete', args=[post.slug]))
+        post_selects = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT') and 'FROM "blog_post"' in q['sql']]
+        self.assertEqual(len(post_selects), 1)
+
+
+class StaticExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+        author = User.objects.create_user('exporter', password='pass12345', role='author')
+        category = Category.objects.create(name='Exported')
+        self.kept, self.edited = [
+            Post.objects.create(
+                title=title, content='<p>body</p>', author=author, category=category, status='published',
+            )
+            for title in ('Kept', 'Edited')
+        ]
+        self.draft = Post.objects.create(title='Draft', content='<p>body</p>', author=author, category=category)
+
+    def export(self):
+        out = StringIO()
+        call_command('export_static', output=self.output, workers=0, stdout=out)
+        return out.getvalue()
+
+    def page(self, *parts):
+        return Path(self.output, *parts, 'index.html')
+
+    def test_incremental_export_renders_only_changed_posts(self):
+        self.assertIn('(2 posts)', self.export())
+        self.assertTrue(self.page().exists())
+        self.assertTrue(self.page('category', 'exported').exists())
+        self.assertIn('Kept', self.page('post', 'kept').read_text())
+        self.assertFalse(self.page('post', 'draft').exists())
+
+        self.assertIn('Nothing changed', self.export())
+
+        self.edited.content = '<p>Revised body</p>'
+        self.edited.save()
+        self.kept.delete()
+        self.assertIn('(1 posts), removed 1', self.export())
+        self.assertIn('Revised body', self.page('post', 'edited').read_text())
+        self.assertFalse(self.page('post', 'kept').exists())
+
+
+class FeedAndSitemapTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('syndicator', password='pass12345', role='author')
+        cls.category = Category.objects.create(name='Syndicated')
+        cls.posts = [
+            Post.objects.create(
+                title=f'Feed post {i}', content='<p>body</p>', author=author,
+                category=cls.category, status='published',
+            )
+            for i in range(3)
+        ]
+        Post.objects.create(title='Feed draft', content='<p>body</p>', author=author, category=cls.category)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_are_cached_validated_and_invalidated_on_publish(self):
+        url = reverse('blog:category_feed_atom', args=[self.category.slug])
+        response = self.client.get(url)
+        self.assertContains(response, 'Feed post 2')
+        self.assertNotContains(response, 'Feed draft')
+        self.assertTrue(response['Content-Type'].startswith('application/atom+xml'))
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        Post.objects.filter(title='Feed draft').publish()
+        response = self.client.get(reverse('blog:feed'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertContains(response, 'Feed draft')
+
+    def test_taxonomy_changes_refresh_feeds_and_the_listings_sitemap(self):
+        sitemap = self.client.get(reverse('blog:sitemap_pages'))
+        etag = sitemap['ETag']
+        b''.join(sitemap)
+        feed_url = reverse('blog:category_feed', args=[self.category.slug])
+        self.assertContains(self.client.get(feed_url), '<title>Syndicated - Advanced Blog</title>')
+
+        Category.objects.create(name='Brand new')
+        self.category.name = 'Renamed'
+        self.category.save()
+        sitemap = self.client.get(reverse('blog:sitemap_pages'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(sitemap.status_code, 200)
+        self.assertIn(b'/category/brand-new/', b''.join(sitemap))
+        self.assertContains(self.client.get(feed_url), '<title>Renamed - Advanced Blog</title>')
+
+    def test_pages_are_cached_per_host(self):
+        for url in (reverse('blog:sitemap'), reverse('blog:feed')):
+            poisoned = self.client.get(url, HTTP_HOST='attacker.railway.app')
+            self.assertIn(b'attacker.railway.app', b''.join(poisoned) if poisoned.streaming else poisoned.content)
+            response = self.client.get(url, HTTP_HOST='localhost')
+            body = b''.join(response) if response.streaming else response.content
+            self.assertNotIn(b'attacker', body)
+            self.assertIn(b'http://localhost/', body)
+
+    def test_sitemap_is_chunked_and_streamed(self):
+        with patch('apps.blog.sitemaps.CHUNK_SIZE', 2):
+            index = self.client.get(reverse('blog:sitemap'))
+            self.assertContains(index, reverse('blog:sitemap_posts', args=[2]))
+            self.assertNotContains(index, reverse('blog:sitemap_posts', args=[3]))
+            chunk = self.client.get(reverse('blog:sitemap_posts', args=[2]))
+            self.assertTrue(chunk.streaming)
+            body = b''.join(chunk.streaming_content).decode()
+            self.assertIn(f'http://testserver/post/{self.posts[2].slug}/', body)
+            self.assertNotIn(self.posts[0].slug, body)
+            self.assertEqual(self.client.get(reverse('blog:sitemap_posts', args=[3])).status_code, 404)
+            # The fully streamed chunk was cached
+            with self.assertNumQueries(0):
+                self.assertContains(self.client.get(reverse('blog:sitemap_posts', args=[2])), self.posts[2].slug)
+
+
+class AsyncReadViewTests(TestCase):
+    """The async read views (BLOG_ASYNC_VIEWS), through the ASGI handler."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Cleanups run last first: the URLconf is rebuilt once the setting is back
+        cls.addClassCleanup(cls.reload_urls)
+        cls.enterClassContext(override_settings(BLOG_ASYNC_VIEWS=True))
+        cls.reload_urls()
+        super().setUpClass()
+
+    @staticmethod
+    def reload_urls():
+        importlib.reload(blog_urls)
+        importlib.reload(project_urls)
+        clear_url_caches()
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('async-author', password='pass12345', role='author')
+        cls.category = Category.objects.create(name='Awaited')
+        cls.tag = Tag.objects.create(name='awaited-tag')
+        cls.posts = []
+        for i in range(12):
+            post = Post.objects.create(
+                title=f'Awaited {i}', content='<p>async body</p>', author=author,
+                category=cls.category, status='published',
+            )
+            post.tags.add(cls.tag)
+            cls.posts.append(post)
+        Comment.objects.create(post=cls.posts[-1], user=author, content='First!', is_approved=True)
+
+    def setUp(self):
+        cache.clear()
+        slug_cache.clear()
+        request_metrics.reset()
+
+    async def test_read_views_are_async_and_render(self):
+        newest = self.posts[-1]
+        pages = {
+            reverse('blog:home'): newest.title,
+            reverse('blog:category_posts', args=[self.category.slug]) + '?page=2': self.posts[0].title,
+            reverse('blog:tag_posts', args=[self.tag.slug]): newest.title,
+            reverse('blog:post_detail', args=[newest.slug]): 'First!',
+        }
+        for url, text in pages.items():
+            response = await self.async_client.get(url)
+            self.assertTrue(response.resolver_match.func.view_class.view_is_async)
+            self.assertContains(response, text)
+        self.assertEqual((await self.async_client.get(reverse('blog:home') + '?page=9')).status_code, 404)
+        self.assertEqual((await self.async_client.get(reverse('blog:tag_posts', args=['missing']))).status_code, 404)
+
+    async def test_pages_are_cached_validated_and_measured(self):
+        url = reverse('blog:post_detail', args=[self.posts[0].slug])
+        response = await self.async_client.get(url)
+        self.assertEqual(page_cache_stats.stats()['misses'], 1)
+        not_modified = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        route = request_metrics.stats()['routes']['GET blog:post_detail']
+        self.assertEqual(route['requests'], 2)
+        self.assertGreater(route['max_queries'], 0)
@@ -0,0 +1,80 @@
+"""Threaded comments for the post page.
+
+A post page shows ``THREADS_PER_PAGE`` top-level comments, newest first and
+keyset paginated like the listings, each with its first ``REPLY_PREVIEW``
+replies in thread order.  That is two queries whatever the number of
+threads: the replies of the whole page are ranked per thread with a window
+function and cut off in the database.  Further replies are fetched on
+demand, ``REPLY_PAGE`` at a time after the last path shown, as HTML
+fragments from ``CommentRepliesView``.
+"""
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment
+from .pagination import KeysetPaginator
+
+THREADS_PER_PAGE = 20
+REPLY_PREVIEW = 3
+REPLY_PAGE = 50
+
+
+def approved_comments():
+    return Comment.objects.filter(is_approved=True).select_related('user')
+
+
+def load_threads(post, cursor=None):
+    """A page of top-level comments, each with ``preview`` and ``more_replies``."""
+    page = KeysetPaginator(root_comments(post), THREADS_PER_PAGE).page(cursor)
+    if page:
+        attach_previews(page, preview_replies(page))
+    return page
+
+
+async def aload_threads(post, cursor=None):
+    """``load_threads()`` through the async ORM."""
+    page = await KeysetPaginator(root_comments(post), THREADS_PER_PAGE).apage(cursor)
+    if page:
+        attach_previews(page, [reply async for reply in preview_replies(page)])
+    return page
+
+
+def root_comments(post):
+    return approved_comments().filter(post=post, depth=0)
+
+
+def preview_replies(page):
+    # One row past the preview tells whether there are more
+    return (
+        approved_comments().filter(thread__in=[root.pk for root in page], depth__gt=0)
+        .annotate(position=Window(RowNumber(), partition_by=F('thread'), order_by=F('path').asc()))
+        .filter(position__lte=REPLY_PREVIEW + 1)
+        .order_by('thread', 'path')
+    )
+
+
+def attach_previews(page, replies):
+    threads = {}
+    for root in page:
+        root.preview, root.more_replies = [], False
+        threads[root.pk] = root
+    for reply in replies:
+        root = threads[reply.thread_id]
+        if reply.position > REPLY_PREVIEW:
+            root.more_replies = True
+        else:
+            root.preview.append(reply)
+
+
+def later_replies(root, after=''):
+    # One row past the page tells whether there are more
+    return (
+        approved_comments().filter(thread=root, depth__gt=0, path__gt=after or root.path)
+        .order_by('path')[:REPLY_PAGE + 1]
+    )
+
+
+def load_replies(root, after=''):
+    """Return ``(replies, has_more)``: the next replies of ``root`` after path ``after``."""
+    replies = list(later_replies(root, after))
+    return replies[:REPLY_PAGE], len(replies) > REPLY_PAGE
@@ -1,15 +1,32 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from django.utils.feedgenerator import Atom1Feed
+
+from . import async_views, feeds, sitemaps, views
+
+# Public read views; async under the ASGI profile (gunicorn.conf.py)
+read_views = async_views if settings.BLOG_ASYNC_VIEWS else views
 
 urlpatterns = [
-    path('', views.PostListView.as_view(), name='home'),
-    path('category/<slug:slug>/', views.CategoryPostListView.as_view(), name='category_posts'),
-    path('tag/<slug:slug>/', views.TagPostListView.as_view(), name='tag_posts'),
+    path('', read_views.PostListView.as_view(), name='home'),
+    path('category/<slug:slug>/', read_views.CategoryPostListView.as_view(), name='category_posts'),
+    path('tag/<slug:slug>/', read_views.TagPostListView.as_view(), name='tag_posts'),
+    path('feed/', feeds.PostFeedView.as_view(), name='feed'),
+    path('feed/atom/', feeds.PostFeedView.as_view(feed_type=Atom1Feed), name='feed_atom'),
+    path('category/<slug:slug>/feed/', feeds.CategoryFeedView.as_view(), name='category_feed'),
+    path('category/<slug:slug>/feed/atom/', feeds.CategoryFeedView.as_view(feed_type=Atom1Feed), name='category_feed_atom'),
+    path('tag/<slug:slug>/feed/', feeds.TagFeedView.as_view(), name='tag_feed'),
+    path('tag/<slug:slug>/feed/atom/', feeds.TagFeedView.as_view(feed_type=Atom1Feed), name='tag_feed_atom'),
+    path('sitemap.xml', sitemaps.SitemapIndexView.as_view(), name='sitemap'),
+    path('sitemap-pages.xml', sitemaps.ListingSitemapView.as_view(), name='sitemap_pages'),
+    path('sitemap-posts-<int:number>.xml', sitemaps.PostSitemapView.as_view(), name='sitemap_posts'),
     path('post/new/', views.PostCreateView.as_view(), name='post_create'),
     path('post/<slug:slug>/edit/', views.PostUpdateView.as_view(), name='post_edit'),
     path('post/<slug:slug>/delete/', views.PostDeleteView.as_view(), name='post_delete'),
-    path('post/<slug:slug>/', views.PostDetailView.as_view(), name='post_detail'),
-    path('search/', views.PostSearchView.as_view(), name='search'),
+    path('post/<slug:slug>/', read_views.PostDetailView.as_view(), name='post_detail'),
+    path('post/<slug:slug>/comments/<int:pk>/replies/', views.CommentRepliesView.as_view(), name='comment_replies'),
+    path('search/', read_views.PostSearchView.as_view(), name='search'),
+    path('comments/moderate/', views.CommentModerationView.as_view(), name='comment_moderation'),
     path('comment/<int:pk>/approve/', views.CommentApproveView.as_view(), name='comment_approve'),
     path('comment/<int:pk>/delete/', views.CommentDeleteView.as_view(), name='comment_delete'),
 ]
\ No newline at end of file
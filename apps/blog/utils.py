@@ -0,0 +1,32 @@
+import html
+import math
+import re
+
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+EXCERPT_WORDS = 50
+WORDS_PER_MINUTE = 200
+
+_whitespace_re = re.compile(r'\s+')
+# Block-level boundaries that separate words even without whitespace
+_block_end_re = re.compile(r'(</(?:p|div|li|h[1-6]|blockquote|pre|td|th|tr)>|<br\s*/?>)', re.I)
+
+
+def html_to_text(value):
+    """Plain text from CKEditor HTML: tags stripped, entities decoded."""
+    text = html.unescape(strip_tags(_block_end_re.sub(r'\1 ', value or '')))
+    return _whitespace_re.sub(' ', text).strip()
+
+
+def summarize(value, words=EXCERPT_WORDS):
+    """Return ``(excerpt, word_count, reading_time)`` for an HTML body.
+
+    The excerpt is plain text so it is safe to render with autoescaping and
+    can never contain unbalanced markup.
+    """
+    text = html_to_text(value)
+    word_count = len(text.split())
+    excerpt = Truncator(text).words(words)
+    reading_time = max(1, math.ceil(word_count / WORDS_PER_MINUTE))
+    return excerpt, word_count, reading_time
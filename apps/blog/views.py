@@ -1,32 +1,65 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.exceptions import PermissionDenied
+from django.http import Http404
 from django.shortcuts import redirect
 from django.views.generic import (
-    ListView, DetailView, CreateView, UpdateView, DeleteView, View
+    ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView, View
 )
 from django.urls import reverse_lazy
 from django.shortcuts import redirect
-from django.db.models import Q
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import Max, Q
 from .models import Post, Category, Tag, Comment
 from .forms import CommentForm, PostForm
-from django.utils.text import slugify
+from .search import MAX_RESULTS, get_search_backend
+from .slugs import resolve_slug
+from .threads import load_replies, load_threads
+from .cache import CachedPageMixin, ConditionalGetMixin, get_timeout, get_versions
+from .pagination import KeysetPaginationMixin, KeysetPaginator
 
-class PostListView(ListView):
+class MemoizedObjectMixin:
+    """Fetch the view's object once per request.
+
+    ``test_func()``, ``get()`` and ``post()`` all call ``get_object()``.
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+
+class ListingConditionalGetMixin(ConditionalGetMixin):
+    """Freshness of a listing: the newest edit among its posts.
+
+    Deletions leave the newest edit unchanged, but they bump the listing's
+    cache scopes, whose versions are part of the ETag.  The MAX is read from
+    blog_post_status_updated_idx rather than by counting the listing.
+    """
+
+    def get_listing_filter(self):
+        return Q()
+
+    def get_conditional_state(self):
+        return Post.published.filter(self.get_listing_filter()).aggregate(last_modified=Max('updated_at'))
+
+    async def aget_conditional_state(self):
+        return await Post.published.filter(self.get_listing_filter()).aaggregate(last_modified=Max('updated_at'))
+
+
+class PostListView(ListingConditionalGetMixin, CachedPageMixin, KeysetPaginationMixin, ListView):
     model = Post
     template_name = 'blog/post_list.html'
     context_object_name = 'posts'
     paginate_by = 10
+    cache_scopes = ('posts', 'sidebar')
 
     def get_queryset(self):
-        return Post.objects.filter(status='published').select_related('author', 'category')
-
-    def get_categories(self):
-        return Category.objects.all()
-
-    def get_tags(self):
-        return Tag.objects.all()
+        return Post.published.for_listing()
 
 
 class RoleRequiredMixin(UserPassesTestMixin):
@@ -52,45 +85,82 @@ class RoleRequiredMixin(UserPassesTestMixin):
                 return redirect('blog:home')
             raise
 
-class CategoryPostListView(ListView):
+class CategoryPostListView(ListingConditionalGetMixin, CachedPageMixin, KeysetPaginationMixin, ListView):
     model = Post
     template_name = 'blog/category_posts.html'
     context_object_name = 'posts'
     paginate_by = 10
 
+    def get_listing_filter(self):
+        return Q(category__slug=self.kwargs['slug'])
+
+    def get_cache_scopes(self):
+        return super().get_cache_scopes() + ['sidebar', f"category:{self.kwargs['slug']}"]
+
     def get_queryset(self):
-        category = get_object_or_404(Category, slug=self.kwargs['slug'])
-        return Post.objects.filter(category=category, status='published')
+        self.category = resolve_slug(Category, self.kwargs['slug'])
+        return Post.published.for_listing().filter(category=self.category)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['category'] = get_object_or_404(Category, slug=self.kwargs['slug'])
+        context['category'] = self.category
         return context
 
-class TagPostListView(ListView):
+class TagPostListView(ListingConditionalGetMixin, CachedPageMixin, KeysetPaginationMixin, ListView):
     model = Post
     template_name = 'blog/tag_posts.html'
     context_object_name = 'posts'
     paginate_by = 10
 
+    def get_listing_filter(self):
+        return Q(tags__slug=self.kwargs['slug'])
+
+    def get_cache_scopes(self):
+        return super().get_cache_scopes() + ['sidebar', f"tag:{self.kwargs['slug']}"]
+
     def get_queryset(self):
-        tag = get_object_or_404(Tag, slug=self.kwargs['slug'])
-        return Post.objects.filter(tags=tag, status='published')
+        self.tag = resolve_slug(Tag, self.kwargs['slug'])
+        return Post.published.for_listing().filter(tags=self.tag)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['tag'] = get_object_or_404(Tag, slug=self.kwargs['slug'])
+        context['tag'] = self.tag
         return context
 
-class PostDetailView(DetailView):
+class PostDetailView(ConditionalGetMixin, CachedPageMixin, MemoizedObjectMixin, DetailView):
     model = Post
     template_name = 'blog/post_detail.html'
     context_object_name = 'post'
+    # Freshness: the post's last edit and its newest visible comment
+    state_aggregates = {
+        'post': Max('updated_at'),
+        'comment': Max('comments__created_at', filter=Q(comments__is_approved=True)),
+    }
+
+    def get_cache_scopes(self):
+        return super().get_cache_scopes() + [f"post:{self.kwargs['slug']}"]
+
+    def get_conditional_state(self):
+        state = Post.objects.filter(slug=self.kwargs['slug']).aggregate(**self.state_aggregates)
+        state['last_modified'] = max(filter(None, state.values()), default=None)
+        return state
+
+    async def aget_conditional_state(self):
+        state = await Post.objects.filter(slug=self.kwargs['slug']).aaggregate(**self.state_aggregates)
+        state['last_modified'] = max(filter(None, state.values()), default=None)
+        return state
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['comments'] = self.object.comments.filter(is_approved=True)
+        # The async view (apps.blog.async_views) passes these in, already loaded
+        if 'threads' not in context:
+            context['threads'] = load_threads(self.object, self.request.GET.get('cursor'))
         context['comment_form'] = CommentForm()
+        # Key for the cached article fragment (used for signed-in readers,
+        # whose pages are not cached whole)
+        if 'fragment_version' not in context:
+            context['fragment_version'] = '-'.join(map(str, get_versions(self.get_cache_scopes())))
+        context['fragment_timeout'] = get_timeout()
         return context
 
     def post(self, request, *args, **kwargs):
@@ -101,6 +171,13 @@ class PostDetailView(DetailView):
             comment = form.save(commit=False)
             comment.post = self.object
             comment.user = request.user
+            if request.POST.get('parent'):
+                try:
+                    parent_id = int(request.POST['parent'])
+                except ValueError:
+                    raise Http404('No such comment.')
+                # Replies go to visible comments of this post only
+                comment.parent = get_object_or_404(Comment, pk=parent_id, post=self.object, is_approved=True)
             # Auto-approve comments from admin/author, else require moderation
             if request.user.role in ['admin', 'author']:
                 comment.is_approved = True
@@ -114,30 +191,41 @@ class PostDetailView(DetailView):
             context['comment_form'] = form
             return self.render_to_response(context)
 
-class PostCreateView(LoginRequiredMixin, RoleRequiredMixin, CreateView):
+class CommentRepliesView(CachedPageMixin, TemplateView):
+    """HTML fragment with the next replies of a thread ("load more replies")."""
+    template_name = 'blog/includes/comment_replies.html'
+
+    def get_cache_scopes(self):
+        return super().get_cache_scopes() + [f"post:{self.kwargs['slug']}"]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        root = get_object_or_404(
+            Comment.objects.select_related('post'),
+            pk=self.kwargs['pk'], post__slug=self.kwargs['slug'], depth=0, is_approved=True,
+        )
+        context['root'], context['post'] = root, root.post
+        context['replies'], context['more_replies'] = load_replies(root, self.request.GET.get('after'))
+        return context
+
+class PostTagsMixin:
+    """Save the post and its comma-separated tags in one transaction."""
+
+    def form_valid(self, form):
+        with transaction.atomic():
+            response = super().form_valid(form)
+            # set() only adds and removes the difference
+            self.object.tags.set(Tag.objects.resolve(form.cleaned_data['tags_input']))
+        return response
+
+class PostCreateView(LoginRequiredMixin, RoleRequiredMixin, PostTagsMixin, CreateView):
     model = Post
     template_name = 'blog/post_form.html'
     form_class = PostForm
 
     def form_valid(self, form):
         form.instance.author = self.request.user
-        # Save the post first (without tags)
-        response = super().form_valid(form)
-
-        # Handle comma-separated tags from the form
-        tags_input = form.cleaned_data.get('tags_input', '')
-        tag_names = [t.strip() for t in tags_input.split(',') if t.strip()]
-        tag_objs = []
-        for name in tag_names:
-            slug = slugify(name)
-            tag, created = Tag.objects.get_or_create(slug=slug, defaults={'name': name})
-            tag_objs.append(tag)
-
-        # Assign tags to post
-        if tag_objs:
-            self.object.tags.set(tag_objs)
-
-        return response
+        return super().form_valid(form)
 
     def test_func(self):
         return getattr(self.request.user, 'role', None) in ('admin', 'author')
@@ -145,44 +233,30 @@ class PostCreateView(LoginRequiredMixin, RoleRequiredMixin, CreateView):
     def get_success_url(self):
         return reverse_lazy('blog:post_detail', kwargs={'slug': self.object.slug})
 
-class PostUpdateView(LoginRequiredMixin, RoleRequiredMixin, UpdateView):
+class PostUpdateView(LoginRequiredMixin, RoleRequiredMixin, PostTagsMixin, MemoizedObjectMixin, UpdateView):
     model = Post
     template_name = 'blog/post_form.html'
     form_class = PostForm
 
+    def get_queryset(self):
+        # PostForm reads the current tags from the prefetch
+        return Post.objects.prefetch_related('tags')
+
     def test_func(self):
         post = self.get_object()
-        return (self.request.user == post.author) or (getattr(self.request.user, 'role', None) == 'admin')
+        return (self.request.user.pk == post.author_id) or (getattr(self.request.user, 'role', None) == 'admin')
 
     def get_success_url(self):
         return reverse_lazy('blog:post_detail', kwargs={'slug': self.object.slug})
 
-    def form_valid(self, form):
-        # Save the post instance
-        response = super().form_valid(form)
-
-        # Update tags based on tags_input
-        tags_input = form.cleaned_data.get('tags_input', '')
-        tag_names = [t.strip() for t in tags_input.split(',') if t.strip()]
-        tag_objs = []
-        for name in tag_names:
-            slug = slugify(name)
-            tag, created = Tag.objects.get_or_create(slug=slug, defaults={'name': name})
-            tag_objs.append(tag)
-
-        # Assign tags (can be empty to clear)
-        self.object.tags.set(tag_objs)
-
-        return response
-
-class PostDeleteView(LoginRequiredMixin, RoleRequiredMixin, DeleteView):
+class PostDeleteView(LoginRequiredMixin, RoleRequiredMixin, MemoizedObjectMixin, DeleteView):
     model = Post
     success_url = reverse_lazy('blog:home')
     template_name = 'blog/post_confirm_delete.html'
 
     def test_func(self):
         post = self.get_object()
-        return (self.request.user == post.author) or (getattr(self.request.user, 'role', None) == 'admin')
+        return (self.request.user.pk == post.author_id) or (getattr(self.request.user, 'role', None) == 'admin')
 
 class PostSearchView(ListView):
     model = Post
@@ -191,18 +265,31 @@ class PostSearchView(ListView):
     paginate_by = 10
 
     def get_queryset(self):
+        # Ranked post ids from the full-text index; posts are only loaded
+        # for the page being displayed.  One id past the cap tells whether
+        # matches were left out.
         query = self.request.GET.get('q')
+        self.results_limited = False
         if query:
-            return Post.objects.filter(
-                Q(title__icontains=query) |
-                Q(content__icontains=query),
-                status='published'
-            ).distinct()
-        return Post.objects.none()
+            post_ids = get_search_backend().search(query, limit=MAX_RESULTS + 1)
+            self.results_limited = len(post_ids) > MAX_RESULTS
+            return post_ids[:MAX_RESULTS]
+        return []
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, post_ids, is_paginated = super().paginate_queryset(queryset, page_size)
+        posts = Post.published.for_listing().in_bulk(post_ids)
+        page.object_list = [posts[pk] for pk in post_ids if pk in posts]
+        snippets = get_search_backend().snippets(self.request.GET.get('q'), list(posts))
+        for post in page.object_list:
+            post.search_snippet = snippets.get(post.pk, '')
+        return paginator, page, page.object_list, is_paginated
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['query'] = self.request.GET.get('q', '')
+        context['results_limited'] = self.results_limited
+        context['max_results'] = MAX_RESULTS
         return context
 
 class CommentApproveView(LoginRequiredMixin, RoleRequiredMixin, View):
@@ -216,13 +303,62 @@ class CommentApproveView(LoginRequiredMixin, RoleRequiredMixin, View):
     def test_func(self):
         return getattr(self.request.user, 'role', None) in ('admin', 'author')
 
-class CommentDeleteView(LoginRequiredMixin, RoleRequiredMixin, DeleteView):
+class CommentDeleteView(LoginRequiredMixin, RoleRequiredMixin, MemoizedObjectMixin, DeleteView):
     model = Comment
     template_name = 'blog/comment_confirm_delete.html'
 
+    def get_queryset(self):
+        return Comment.objects.select_related('post')
+
+    def form_valid(self, form):
+        success_url = self.get_success_url()
+        # remove() keeps the post's comment count and cached pages in step
+        Comment.objects.filter(pk=self.object.pk).remove()
+        return redirect(success_url)
+
     def get_success_url(self):
         return reverse_lazy('blog:post_detail', kwargs={'slug': self.object.post.slug})
 
     def test_func(self):
         comment = self.get_object()
-        return (self.request.user == comment.post.author) or (getattr(self.request.user, 'role', None) == 'admin')
+        return (self.request.user.pk == comment.post.author_id) or (getattr(self.request.user, 'role', None) == 'admin')
+
+
+class CommentModerationView(LoginRequiredMixin, RoleRequiredMixin, ListView):
+    """Pending comments on the user's posts (every post for admins).
+
+    Selected comments are approved or rejected (deleted) in bulk, one
+    statement each.
+    """
+    template_name = 'blog/comment_moderation.html'
+    context_object_name = 'comments'
+    paginate_by = 25
+
+    def test_func(self):
+        return getattr(self.request.user, 'role', None) in ('admin', 'author')
+
+    def get_queryset(self):
+        comments = Comment.objects.pending()
+        if self.request.user.role != 'admin':
+            comments = comments.filter(post__author=self.request.user)
+        return comments
+
+    def paginate_queryset(self, queryset, page_size):
+        queryset = queryset.select_related('user', 'post').only(
+            'content', 'created_at', 'user__username', 'post__title', 'post__slug',
+        )
+        page = KeysetPaginator(queryset, page_size).page(self.request.GET.get('cursor'))
+        return None, page, page.object_list, page.has_other_pages()
+
+    def post(self, request, *args, **kwargs):
+        ids = [pk for pk in request.POST.getlist('comments') if pk.isdigit()]
+        # Re-filtered through get_queryset() so nobody moderates others' posts
+        selected = self.get_queryset().filter(pk__in=ids)
+        action = request.POST.get('action')
+        if action == 'approve':
+            messages.success(request, f'Approved {selected.approve()} comment(s).')
+        elif action == 'reject':
+            messages.success(request, f'Rejected {selected.remove()} comment(s).')
+        else:
+            messages.warning(request, 'Choose approve or reject.')
+        return redirect('blog:comment_moderation')
@@ -0,0 +1,41 @@
+"""gunicorn settings, read automatically from the project root.
+
+SERVER_PROFILE picks the deployment:
+
+    wsgi (default)  sync workers running advanced_blog.wsgi; one request
+                    per worker at a time
+    asgi            uvicorn workers running advanced_blog.asgi with the
+                    async read views (BLOG_ASYNC_VIEWS); a worker keeps
+                    serving other requests while one waits on the database
+
+Worker count comes from WEB_CONCURRENCY or --workers as before.
+"""
+import os
+
+profile = os.environ.get('SERVER_PROFILE', 'wsgi')
+if profile not in ('wsgi', 'asgi'):
+    raise RuntimeError(f'SERVER_PROFILE must be wsgi or asgi, not {profile!r}')
+
+errorlog = '-'
+
+if profile == 'asgi':
+    wsgi_app = 'advanced_blog.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    # Read by settings.py in the workers, which inherit this environment
+    os.environ.setdefault('BLOG_ASYNC_VIEWS', 'true')
+    # Each request's queries run in a thread of their own, so connections
+    # kept open per thread would pile up
+    os.environ.setdefault('DJANGO_CONN_MAX_AGE', '0')
+else:
+    wsgi_app = 'advanced_blog.wsgi:application'
+
+
+def on_starting(server):
+    # The page cache's invalidations only reach every worker through a shared
+    # cache (see CACHES in advanced_blog/settings.py)
+    if server.cfg.workers > 1 and os.environ.get('DJANGO_CACHE_BACKEND', 'locmem') == 'locmem':
+        raise RuntimeError(
+            f'{server.cfg.workers} workers cannot share the per-process locmem cache: '
+            "cached pages would go stale in workers that did not handle an edit. "
+            "Set DJANGO_CACHE_BACKEND to 'file' or 'redis', or run one worker."
+        )
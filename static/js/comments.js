@@ -0,0 +1,23 @@
+// "Load more replies": swap the link for the next replies of its thread.
+// Without JavaScript the link opens the fragment on its own.
+document.addEventListener('click', function (event) {
+    var link = event.target.closest('a[data-load-replies]');
+    if (!link) {
+        return;
+    }
+    event.preventDefault();
+    link.classList.add('disabled');
+    fetch(link.href, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+        .then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.statusText);
+            }
+            return response.text();
+        })
+        .then(function (html) {
+            link.parentElement.outerHTML = html;
+        })
+        .catch(function () {
+            link.classList.remove('disabled');
+        });
+});
@@ -0,0 +1,429 @@
+"""Benchmark every blog and accounts URL against a seeded synthetic dataset.
+
+Builds a throwaway SQLite database in a temporary directory, migrates it and
+fills it with ``manage.py seed_blog``, then requests every route in
+apps/blog/urls.py and apps/accounts/urls.py, anonymously and signed in, and
+reports latency percentiles, queries per request and response size.
+
+    python tools/benchmark.py                          # Django test client
+    python tools/benchmark.py --posts 5000 -n 200
+    python tools/benchmark.py --gunicorn --concurrency 8
+    python tools/benchmark.py --gunicorn --asgi --workers 2 --concurrency 32
+    python tools/benchmark.py --json bench/$(git rev-parse --short HEAD).json
+    python tools/benchmark.py --compare bench/previous.json
+
+``--database-url`` points the run at a dedicated benchmark database (e.g.
+PostgreSQL) instead; it is migrated and its ``seed-`` rows are replaced.
+Never point it at real data.
+
+Test client numbers include the full middleware stack but no network or
+WSGI server; ``--gunicorn`` starts a local server on the same database
+(queries per request are not available there).  ``--asgi`` also starts
+one with the ASGI profile from gunicorn.conf.py (uvicorn workers, async
+read views) and the same number of workers, and both servers report their
+memory use (Linux only), so throughput at a given concurrency can be
+compared at equal memory.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-n', '--requests', type=int, default=50, help='Measured requests per route.')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--comments', type=int, default=5)
+    parser.add_argument('--activity', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cold', action='store_true', help='Clear the cache before every request.')
+    parser.add_argument('--only', help='Only routes whose name contains this text.')
+    parser.add_argument('--gunicorn', action='store_true', help='Also benchmark through a local gunicorn.')
+    parser.add_argument('--asgi', action='store_true', help='Also benchmark the ASGI profile (with --gunicorn).')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes.')
+    parser.add_argument('--concurrency', type=int, default=4, help='Parallel connections for --gunicorn.')
+    parser.add_argument('--database-url', help='Dedicated benchmark database instead of a temporary SQLite file.')
+    parser.add_argument('--json', help='Write results to this file.')
+    parser.add_argument('--compare', help='Print the change against an earlier --json file.')
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+TEMP_DIR = tempfile.mkdtemp(prefix='blog-bench-')
+os.environ['DATABASE_URL'] = ARGS.database_url or f'sqlite:///{TEMP_DIR}/bench.sqlite3'
+# Production-like settings; static files are served unhashed so no
+# collectstatic is needed
+os.environ['DJANGO_DEBUG'] = 'False'
+os.environ['DJANGO_STATIC_MANIFEST'] = 'False'
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'advanced_blog.settings')
+
+import django
+django.setup()
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from apps.accounts.activity import activity_sink
+from apps.accounts.models import User
+from apps.blog.models import Comment, Post, Tag
+
+
+# Must be in ALLOWED_HOSTS, since DEBUG is off
+HOST = '127.0.0.1'
+
+
+class Route:
+    """How to request one URL pattern.
+
+    ``kwargs`` picks URL arguments from the seeded sample; ``users`` lists
+    who requests it (None is anonymous); ``fresh_login`` signs in again
+    before every request, for views that end the session.
+    """
+
+    def __init__(self, kwargs=None, users=(None,), method='get', query='', fresh_login=False):
+        self.kwargs = kwargs or (lambda sample: {})
+        self.users = users
+        self.method = method
+        self.query = query
+        self.fresh_login = fresh_login
+
+
+PUBLIC = (None, 'reader')
+ROUTES = {
+    'blog:home': Route(users=PUBLIC),
+    'blog:category_posts': Route(lambda s: {'slug': s['post'].category.slug}, users=PUBLIC),
+    'blog:tag_posts': Route(lambda s: {'slug': s['tag'].slug}, users=PUBLIC),
+    'blog:post_detail': Route(lambda s: {'slug': s['post'].slug}, users=PUBLIC),
+    'blog:comment_replies': Route(lambda s: {'slug': s['post'].slug, 'pk': s['thread'].pk}, users=PUBLIC),
+    'blog:search': Route(users=PUBLIC, query='?q=django+cache'),
+    'blog:feed': Route(users=PUBLIC),
+    'blog:feed_atom': Route(users=PUBLIC),
+    'blog:category_feed': Route(lambda s: {'slug': s['post'].category.slug}, users=PUBLIC),
+    'blog:category_feed_atom': Route(lambda s: {'slug': s['post'].category.slug}, users=PUBLIC),
+    'blog:tag_feed': Route(lambda s: {'slug': s['tag'].slug}, users=PUBLIC),
+    'blog:tag_feed_atom': Route(lambda s: {'slug': s['tag'].slug}, users=PUBLIC),
+    'blog:sitemap': Route(users=PUBLIC),
+    'blog:sitemap_pages': Route(users=PUBLIC),
+    'blog:sitemap_posts': Route(lambda s: {'number': 1}, users=PUBLIC),
+    'blog:post_create': Route(users=('author',)),
+    'blog:post_edit': Route(lambda s: {'slug': s['post'].slug}, users=('author',)),
+    'blog:post_delete': Route(lambda s: {'slug': s['post'].slug}, users=('author',)),
+    # Approving an approved comment again is harmless, so it can repeat
+    'blog:comment_approve': Route(lambda s: {'pk': s['comment'].pk}, users=('author',), method='post'),
+    'blog:comment_delete': Route(lambda s: {'pk': s['comment'].pk}, users=('author',)),
+    'blog:comment_moderation': Route(users=('author', 'admin')),
+    'accounts:register': Route(),
+    'accounts:login': Route(),
+    'accounts:logout': Route(users=('reader',), method='post', fresh_login=True),
+    'accounts:profile': Route(users=('reader',)),
+    'accounts:profile_edit': Route(users=('reader',)),
+    'accounts:dashboard': Route(users=('author', 'admin')),
+}
+
+
+def app_route_names():
+    """Every named route in the blog and accounts URLconfs."""
+    names = []
+    for resolver in get_resolver().url_patterns:
+        if isinstance(resolver, URLResolver) and resolver.namespace in ('blog', 'accounts'):
+            names.extend(
+                f'{resolver.namespace}:{pattern.name}' for pattern in resolver.url_patterns
+                if isinstance(pattern, URLPattern) and pattern.name
+            )
+    return names
+
+
+def prepare_database():
+    call_command('migrate', verbosity=0)
+    call_command(
+        'seed_blog', clear=True, users=ARGS.users, posts=ARGS.posts, comments=ARGS.comments,
+        activity=ARGS.activity, seed=ARGS.seed, stdout=sys.stderr,
+    )
+    # A thread with replies, on a published post by an author
+    thread = (
+        Comment.objects.filter(
+            post__slug__startswith='seed-', post__status='published', post__author__role='author',
+            depth=0, is_approved=True, replies__is_approved=True,
+        )
+        .order_by('pk').first()
+    )
+    post = Post.objects.select_related('author', 'category').get(pk=thread.post_id)
+    return {
+        'post': post,
+        'thread': thread,
+        'tag': Tag.objects.filter(slug__startswith='seed-').order_by('slug').first(),
+        'comment': post.comments.filter(is_approved=True).order_by('pk').first(),
+        'users': {
+            None: None,
+            'author': post.author,
+            'reader': User.objects.filter(username__startswith='seed-', role='reader').order_by('pk').first(),
+            'admin': User.objects.filter(username__startswith='seed-', role='admin').order_by('pk').first(),
+        },
+    }
+
+
+def targets(sample):
+    names = app_route_names()
+    missing = [name for name in names if name not in ROUTES]
+    if missing:
+        sys.exit(f'No benchmark Route for {", ".join(missing)}; add it to ROUTES in {__file__}.')
+    for name in names:
+        if ARGS.only and ARGS.only not in name:
+            continue
+        route = ROUTES[name]
+        url = reverse(name, kwargs=route.kwargs(sample)) + route.query
+        for user in route.users:
+            yield f'{name} [{user or "anon"}]', route, url, sample['users'][user]
+
+
+def summarize(latencies, sizes, statuses, queries=None, elapsed=None):
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    result = {
+        'requests': len(ordered),
+        'status': sorted(set(statuses)),
+        'p50_ms': round(percentile(50), 2),
+        'p95_ms': round(percentile(95), 2),
+        'p99_ms': round(percentile(99), 2),
+        'mean_ms': round(statistics.fmean(ordered), 2),
+        'bytes': round(statistics.fmean(sizes)),
+        'queries': round(statistics.fmean(queries), 1) if queries else None,
+    }
+    if elapsed:
+        result['rps'] = round(len(ordered) / elapsed, 1)
+    return result
+
+
+def response_size(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def run_client(route, url, user):
+    client = Client(HTTP_HOST=HOST)
+    if user is not None:
+        client.force_login(user)
+    latencies, sizes, statuses, queries = [], [], [], []
+    for i in range(ARGS.warmup + ARGS.requests):
+        if route.fresh_login:
+            client.force_login(user)
+        if ARGS.cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = getattr(client, route.method)(url)
+            size = response_size(response)
+            elapsed = (time.perf_counter() - started) * 1000
+        if i >= ARGS.warmup:
+            latencies.append(elapsed)
+            sizes.append(size)
+            statuses.append(response.status_code)
+            queries.append(len(ctx.captured_queries))
+    return summarize(latencies, sizes, statuses, queries)
+
+
+def session_cookie(user):
+    """Cookies and CSRF header that sign a raw HTTP request in as ``user``."""
+    client = Client(HTTP_HOST=HOST)
+    if user is not None:
+        client.force_login(user)
+    client.get(reverse('accounts:login'))
+    cookies = {name: morsel.value for name, morsel in client.cookies.items()}
+    headers = {'Cookie': '; '.join(f'{name}={value}' for name, value in cookies.items())}
+    if 'csrftoken' in cookies:
+        headers['X-CSRFToken'] = cookies['csrftoken']
+    return headers
+
+
+def run_gunicorn(port, route, url, user):
+    headers = session_cookie(user)
+
+    def worker(count):
+        conn = HTTPConnection('127.0.0.1', port, timeout=30)
+        results = []
+        for _ in range(count):
+            request_headers = session_cookie(user) if route.fresh_login else headers
+            started = time.perf_counter()
+            conn.request(route.method.upper(), url, headers={**request_headers, 'Host': HOST})
+            response = conn.getresponse()
+            body = response.read()
+            results.append(((time.perf_counter() - started) * 1000, len(body), response.status))
+        conn.close()
+        return results
+
+    worker(ARGS.warmup)
+    per_worker = [ARGS.requests // ARGS.concurrency] * ARGS.concurrency
+    per_worker[0] += ARGS.requests % ARGS.concurrency
+    started = time.perf_counter()
+    with ThreadPoolExecutor(ARGS.concurrency) as pool:
+        results = [row for rows in pool.map(worker, per_worker) for row in rows]
+    elapsed = time.perf_counter() - started
+    latencies, sizes, statuses = zip(*results)
+    return summarize(latencies, sizes, statuses, elapsed=elapsed)
+
+
+def start_gunicorn(profile):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        ['gunicorn', '--config', str(PROJECT_ROOT / 'gunicorn.conf.py'), '--bind', f'127.0.0.1:{port}',
+         '--workers', str(ARGS.workers), '--log-level', 'warning'],
+        # Several workers need a cache they share (gunicorn.conf.py refuses locmem)
+        cwd=PROJECT_ROOT, env={
+            'DJANGO_CACHE_BACKEND': 'file', 'DJANGO_CACHE_LOCATION': f'{TEMP_DIR}/cache-{profile}',
+            **os.environ, 'SERVER_PROFILE': profile,
+        },
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return server, port
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    sys.exit('gunicorn did not start')
+
+
+def server_rss_mb(pid):
+    """Resident memory of a server and its workers, or None off Linux."""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as fh:
+            pids = [pid, *map(int, fh.read().split())]
+        total_kb = 0
+        for process in pids:
+            with open(f'/proc/{process}/status') as fh:
+                total_kb += next(int(line.split()[1]) for line in fh if line.startswith('VmRSS:'))
+    except (OSError, StopIteration):
+        return None
+    return round(total_kb / 1024, 1)
+
+
+def git_revision():
+    try:
+        revision = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, text=True).strip()
+        dirty = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=PROJECT_ROOT, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision + ('-dirty' if dirty.strip() else '')
+
+
+def print_table(results):
+    print(f'\n{"route":<38}{"mode":<10}{"status":<12}{"p50":>8}{"p95":>8}{"p99":>8}{"queries":>9}{"bytes":>9}')
+    for row in results:
+        queries = '-' if row['queries'] is None else f'{row["queries"]:g}'
+        status = ','.join(map(str, row['status']))
+        print(
+            f'{row["route"]:<38}{row["mode"]:<10}{status:<12}{row["p50_ms"]:>8.1f}{row["p95_ms"]:>8.1f}'
+            f'{row["p99_ms"]:>8.1f}{queries:>9}{row["bytes"]:>9}'
+        )
+
+
+def print_servers(results):
+    rows = [row for row in results if 'rps' in row]
+    if not rows:
+        return
+    print(f'\n{"server":<10}{"workers":>8}{"concurrency":>13}{"req/s":>10}{"peak RSS MB":>13}')
+    for mode in dict.fromkeys(row['mode'] for row in rows):
+        mode_rows = [row for row in rows if row['mode'] == mode]
+        # Requests over time across every route
+        rps = sum(row['requests'] for row in mode_rows) / sum(row['requests'] / row['rps'] for row in mode_rows)
+        peaks = [row['rss_mb'] for row in mode_rows if row.get('rss_mb')]
+        print(f'{mode:<10}{ARGS.workers:>8}{ARGS.concurrency:>13}{rps:>10.1f}{max(peaks) if peaks else "-":>13}')
+
+
+def print_comparison(results, path):
+    with open(path) as fh:
+        previous = {(row['route'], row['mode']): row for row in json.load(fh)['results']}
+    print(f'\nChange against {path}:')
+    print(f'{"route":<38}{"mode":<10}{"p50":>10}{"p95":>10}{"queries":>10}{"bytes":>10}')
+    for row in results:
+        old = previous.get((row['route'], row['mode']))
+        if old is None:
+            continue
+
+        def pct(key):
+            return f'{(row[key] - old[key]) / old[key] * 100:+.0f}%' if old[key] else '-'
+
+        def diff(key):
+            return '-' if row[key] is None or old[key] is None else f'{row[key] - old[key]:+g}'
+
+        print(f'{row["route"]:<38}{row["mode"]:<10}{pct("p50_ms"):>10}{pct("p95_ms"):>10}{diff("queries"):>10}{diff("bytes"):>10}')
+
+
+def main():
+    try:
+        sample = prepare_database()
+        results = []
+        # Mode name -> (process, port); the WSGI one keeps its old name so
+        # earlier --json files still compare
+        servers = {}
+        if ARGS.gunicorn:
+            servers['gunicorn'] = start_gunicorn('wsgi')
+            if ARGS.asgi:
+                servers['asgi'] = start_gunicorn('asgi')
+        try:
+            for name, route, url, user in targets(sample):
+                row = {'route': name, 'method': route.method.upper(), 'url': url}
+                results.append({**row, 'mode': 'client', **run_client(route, url, user)})
+                print(f'{name} (client) done', file=sys.stderr)
+                for mode, (server, port) in servers.items():
+                    result = run_gunicorn(port, route, url, user)
+                    results.append({**row, 'mode': mode, **result, 'rss_mb': server_rss_mb(server.pid)})
+                    print(f'{name} ({mode}) done', file=sys.stderr)
+        finally:
+            for server, port in servers.values():
+                server.terminate()
+                server.wait()
+
+        print_table(results)
+        print_servers(results)
+        if ARGS.compare:
+            print_comparison(results, ARGS.compare)
+        if ARGS.json:
+            meta = {
+                'revision': git_revision(),
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'options': {key: value for key, value in vars(ARGS).items() if key not in ('json', 'compare', 'database_url')},
+            }
+            Path(ARGS.json).parent.mkdir(parents=True, exist_ok=True)
+            with open(ARGS.json, 'w') as fh:
+                json.dump({'meta': meta, 'results': results}, fh, indent=2)
+            print(f'\nWrote {ARGS.json}')
+    finally:
+        # Write buffered page visits now; the atexit flush would find the
+        # database already deleted
+        activity_sink.shutdown()
+        connection.close()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Deep-page latency: offset pagination vs. keyset (cursor) pagination.
+
+Runs against a throwaway test database, never the project database.
+
+    python tools/pagination_benchmark.py                # 60k posts
+    python tools/pagination_benchmark.py 200000
+"""
+import sys
+from pathlib import Path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import os
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'advanced_blog.settings')
+import django
+django.setup()
+
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.accounts.models import User
+from apps.blog.models import Category, Post
+from apps.blog.pagination import KeysetPaginator, encode_cursor
+
+PER_PAGE = 10
+PAGES = [1, 10, 100, 1000, 5000]
+REPEAT = 5
+
+
+def seed(count):
+    author = User.objects.create_user('pager-bench', password='bench-pass-123', role='author')
+    category = Category.objects.create(name='Pagination bench')
+    start = timezone.now() - timedelta(minutes=count)
+    batch = []
+    for i in range(count):
+        batch.append(Post(
+            title=f'Post {i}', slug=f'pagination-bench-{i}', content='<p>x</p>',
+            excerpt='x', author=author, category=category, status='published',
+        ))
+        if len(batch) == 5000:
+            Post.objects.bulk_create(batch)
+            batch = []
+    Post.objects.bulk_create(batch)
+    # auto_now_add ignores explicit values, so spread timestamps afterwards
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT id FROM blog_post ORDER BY id')
+        ids = [row[0] for row in cursor.fetchall()]
+    for offset in range(0, len(ids), 5000):
+        chunk = ids[offset:offset + 5000]
+        Post.objects.bulk_update(
+            [Post(pk=pk, created_at=start + timedelta(minutes=i + offset)) for i, pk in enumerate(chunk)],
+            ['created_at'],
+        )
+
+
+def median_ms(func):
+    samples = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 60_000
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        with transaction.atomic():
+            seed(count)
+        queryset = Post.published.for_listing()
+        print(f'{count} published posts, {PER_PAGE} per page')
+        print(f'{"page":>6}{"offset ms":>12}{"keyset ms":>12}')
+        for number in PAGES:
+            if (number - 1) * PER_PAGE >= count:
+                break
+            # The cursor a reader would hold after clicking through to this page
+            boundary = queryset.order_by('-created_at', '-pk')[(number - 1) * PER_PAGE - 1] if number > 1 else None
+            cursor = encode_cursor(boundary, 'next') if boundary else None
+
+            def offset_page():
+                paginator = Paginator(queryset.order_by('-created_at', '-pk'), PER_PAGE)
+                list(paginator.page(number).object_list)
+                paginator.num_pages
+
+            def keyset_page():
+                list(KeysetPaginator(queryset, PER_PAGE).page(cursor))
+
+            print(f'{number:>6}{median_ms(offset_page):>12.2f}{median_ms(keyset_page):>12.2f}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
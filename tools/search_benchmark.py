@@ -0,0 +1,104 @@
+"""Compare search latency: icontains scan vs. the full-text backend.
+
+Runs against a throwaway test database, never the project database.
+
+    python tools/search_benchmark.py            # 10k and 100k posts
+    python tools/search_benchmark.py 5000       # custom sizes
+"""
+import sys
+from pathlib import Path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import os
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'advanced_blog.settings')
+import django
+django.setup()
+
+import random
+import statistics
+import time
+
+from django.db import connection, transaction
+
+from apps.accounts.models import User
+from apps.blog.models import Category, Post
+from apps.blog.search import IcontainsSearchBackend, get_search_backend
+
+WORDS = (
+    'django python performance query index cache template render database '
+    'server async worker request response queue latency throughput profile '
+    'deploy static media image search ranking tokenizer postgres sqlite'
+).split()
+QUERIES = ['django', 'postgres index', 'latency', 'tokenizer ranking', 'nomatchword']
+REPEAT = 5
+
+
+def make_body(rng):
+    paragraphs = []
+    for _ in range(4):
+        words = ' '.join(rng.choice(WORDS) for _ in range(40))
+        paragraphs.append(f'<p>{words} <strong>{rng.choice(WORDS)}</strong></p>')
+    return ''.join(paragraphs)
+
+
+def seed(count):
+    rng = random.Random(count)
+    author = User.objects.create_user(f'bench{count}', password='bench-pass-123', role='author')
+    category = Category.objects.create(name=f'Bench {count}', slug=f'bench-{count}')
+    batch = []
+    for i in range(count):
+        batch.append(Post(
+            title=' '.join(rng.choice(WORDS) for _ in range(5)),
+            slug=f'bench-{count}-{i}',
+            content=make_body(rng),
+            author=author,
+            category=category,
+            status='published',
+        ))
+        if len(batch) == 2000:
+            Post.objects.bulk_create(batch)
+            batch = []
+    Post.objects.bulk_create(batch)
+
+
+def timed(func, query):
+    samples = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        func(query)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run(count):
+    with transaction.atomic():
+        Post.objects.all().delete()
+        seed(count)
+        backend = get_search_backend()
+        started = time.perf_counter()
+        backend.rebuild()
+        build_ms = (time.perf_counter() - started) * 1000
+
+    print(f'\n{count} posts ({backend.__class__.__name__}, index build {build_ms:.0f} ms)')
+    print(f'{"query":<22}{"icontains ms":>14}{"fulltext ms":>14}{"speedup":>10}')
+    scan = IcontainsSearchBackend()
+    for query in QUERIES:
+        old = timed(scan.search, query)
+        new = timed(backend.search, query)
+        print(f'{query:<22}{old:>14.2f}{new:>14.2f}{old / new if new else 0:>9.1f}x')
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        for count in sizes:
+            run(count)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()